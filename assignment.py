@@ -23,58 +23,281 @@ FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
 OTHER DEALINGS IN THE SOFTWARE.
 """
 
-from docplex.mp.model import Model
+import numpy as np
+from scipy.sparse import csr_matrix, diags
 
 import conf
-from utils import find_path_by_node
+from backends import create_backend
+from heuristic import get_neighbour_lists
 
 
-def create_assignment_model(name, range_nodes, costs):
+def create_assignment_model(name, range_nodes, costs, candidates=None):
     """
     Create assignment model
     :param name: the name of the model
     :param range_nodes: the range nodes
     :param costs: the cost
-    :return:
+    :param candidates: the (tails, heads) edges with a variable in each direction (None for all the arcs)
+    :return: the model and the variable index matrix x (x[i][j] is the column of the arc (i, j), -1 if none)
     """
-    m = Model(name=name, log_output=conf.VERBOSE)
-    # Decision Variable
-    x = m.binary_var_matrix(range_nodes, range_nodes)
+    nodes = len(range_nodes)
+    # Decision Variable, one for each arc (no loop from the same node)
+    if candidates is None:
+        tails, heads = np.nonzero(~np.eye(nodes, dtype=bool))
+    else:
+        tails, heads = np.concatenate(candidates), np.concatenate(candidates[::-1])
+    x = create_index_matrix(nodes, tails, heads)
+    # Objective Function
+    m = create_backend(name, costs[tails, heads])
     # Add basic constraint
     add_basic_constraints(m, x, range_nodes)
+    return m, x
+
+
+def create_symmetric_model(name, range_nodes, costs, candidates=None):
+    """
+    Create the model of the symmetric TSP, with a binary variable for each undirected edge (i, j), i < j
+    :param name: the name of the model
+    :param range_nodes: the range nodes
+    :param costs: the cost (symmetric)
+    :param candidates: the (tails, heads) edges with a variable, tails < heads (None for all the edges)
+    :return: the model and the variable index matrix x (x[i][j] is the column of the edge (i, j), -1 if none)
+    """
+    nodes = len(range_nodes)
+    # Decision Variable, one for each edge
+    tails, heads = np.triu_indices(nodes, 1) if candidates is None else candidates
+    x = create_index_matrix(nodes, tails, heads)
     # Objective Function
-    m.minimize(m.sum(costs[i][j] * x[i, j] for j in range_nodes for i in range_nodes))
+    m = create_backend(name, costs[tails, heads])
+    # Degree of each vertex
+    m.add_sum_constraints([np.concatenate([x[i][x[i] >= 0], x[:, i][x[:, i] >= 0]]) for i in range_nodes], 2, 2,
+                          [row_tag([i], 1, 1) for i in range_nodes])
     return m, x
 
 
+def create_index_matrix(nodes, tails, heads):
+    """
+    Create the variable index matrix
+    :param nodes: the number of nodes
+    :param tails: a numpy array with the first node of each variable
+    :param heads: a numpy array with the second node of each variable
+    :return: a square numpy array, the column of the variable of each arc (-1 if the arc has no variable)
+    """
+    x = np.full((nodes, nodes), -1, dtype=np.int32)
+    x[tails, heads] = np.arange(len(tails))
+    return x
+
+
+def create_model(name, range_nodes, costs, candidates=None):
+    """
+    Create the model of the formulation selected in the configuration
+    :param name: the name of the model
+    :param range_nodes: the range nodes
+    :param costs: the cost
+    :param candidates: the (tails, heads) edges with a variable, tails < heads (None for all the edges)
+    :return:
+    """
+    if use_symmetric_model():
+        return create_symmetric_model(name, range_nodes, costs, candidates)
+    return create_assignment_model(name, range_nodes, costs, candidates)
+
+
+def get_candidate_edges(costs, k, tour=None):
+    """
+    Get the sparse set of edges of the model: the edges to the k nearest neighbours of each node and the edges of a
+    tour (so that the model has a feasible solution)
+    :param costs: the cost matrix
+    :param k: the number of neighbours of each node
+    :param tour: a numpy array with the nodes of a tour (None for no tour)
+    :return: the (tails, heads) numpy arrays of the edges, tails < heads
+    """
+    nodes = len(costs)
+    neighbours = get_neighbour_lists(costs, k)
+    tails, heads = np.repeat(np.arange(nodes), neighbours.shape[1]), neighbours.ravel()
+    if tour is not None:
+        tails, heads = np.concatenate([tails, tour]), np.concatenate([heads, np.roll(tour, -1)])
+    keys = np.unique(np.minimum(tails, heads).astype(np.int64) * nodes + np.maximum(tails, heads))
+    return keys // nodes, keys % nodes
+
+
+def add_edges(m, x, costs, tails, heads):
+    """
+    Add the variables of new edges to the model, and to the tagged constraints that contain them
+    :param m: the model
+    :param x: the variable index matrix, updated with the new columns
+    :param costs: the cost matrix
+    :param tails: a numpy array with the first node of each edge
+    :param heads: a numpy array with the second node of each edge (tails < heads)
+    :return:
+    """
+    if len(tails) == 0:
+        return
+    if not use_symmetric_model():
+        # An arc in each direction
+        tails, heads = np.concatenate([tails, heads]), np.concatenate([heads, tails])
+    columns = m.add_variables(costs[tails, heads])
+    x[tails, heads] = columns
+    coefficients = tag_coefficients(m.row_tags, len(x), tails, heads).tocoo()
+    m.add_to_constraints(coefficients.row, columns[coefficients.col])
+    if not use_symmetric_model():
+        # delete sub-tour with less of 3 nodes
+        m.add_sum_constraints(columns.reshape(2, -1).T, -np.inf, 1)
+
+
+def row_tag(nodes, out_weight, in_weight, inside_weight=0):
+    """
+    Describe a constraint by a node set S: the coefficient of the arc (i, j) is out_weight if only i is in S,
+    in_weight if only j is in S and inside_weight if both are in S (the reduced cost pricing of the missing edges
+    needs to know which constraints contain them)
+    :param nodes: the node list S
+    :param out_weight: the coefficient of the arcs leaving S
+    :param in_weight: the coefficient of the arcs entering S
+    :param inside_weight: the coefficient of the arcs inside S
+    :return: the tag of the constraint
+    """
+    return np.asarray(nodes), out_weight, in_weight, inside_weight
+
+
+def tag_matrix(tags, nodes):
+    """
+    Get the node sets and the weights of the tagged constraints
+    :param tags: the tag of each constraint (None if the constraint has no tag)
+    :param nodes: the number of nodes
+    :return: a sparse matrix with a row for each constraint (1 for the nodes in S) and a (#constraints, 3) numpy array
+    with the out, in and inside weights (0 for the constraints without a tag)
+    """
+    tagged = [(row, tag) for row, tag in enumerate(tags) if tag is not None]
+    lengths = np.zeros(len(tags), dtype=int)
+    weights = np.zeros((len(tags), 3))
+    indices = [np.zeros(0, dtype=int)]
+    for row, (node_set, out_weight, in_weight, inside_weight) in tagged:
+        lengths[row] = len(node_set)
+        weights[row] = out_weight, in_weight, inside_weight
+        indices.append(node_set)
+    indptr = np.concatenate([[0], np.cumsum(lengths)])
+    indices = np.concatenate(indices)
+    return csr_matrix((np.ones(len(indices)), indices, indptr), shape=(len(tags), nodes)), weights
+
+
+def tag_coefficients(tags, nodes, tails, heads):
+    """
+    Get the coefficients of some arcs in the tagged constraints
+    :param tags: the tag of each constraint
+    :param nodes: the number of nodes
+    :param tails: a numpy array with the first node of each arc
+    :param heads: a numpy array with the second node of each arc
+    :return: a sparse (#constraints, #arcs) matrix with the coefficients
+    """
+    matrix, weights = tag_matrix(tags, nodes)
+    tail_in_set, head_in_set = matrix[:, tails], matrix[:, heads]
+    both = tail_in_set.multiply(head_in_set)
+    coefficients = (diags(weights[:, 0]) @ (tail_in_set - both) + diags(weights[:, 1]) @ (head_in_set - both) +
+                    diags(weights[:, 2]) @ both)
+    coefficients.eliminate_zeros()
+    return coefficients.tocsr()
+
+
+def use_symmetric_model():
+    """
+    Check if the model has a variable for each undirected edge (only allowed with symmetric costs)
+    :return: True for the symmetric formulation, False for the assignment one
+    """
+    return conf.solver_params['formulation'] == 'symmetric' and conf.loading_params['symmetric_costs']
+
+
 def add_basic_constraints(m, x, range_nodes):
     """
     add constraints to the model
     :param m: the model
-    :param x: the binary var matrix
+    :param x: the variable index matrix
     :param range_nodes: an iterator from 0 to #nodes-1
     :return:
     """
     # in and out Degree of each vertex
-    [m.add_constraint(m.sum(x[i, j] for j in range_nodes) == 1) for i in range_nodes]
-    [m.add_constraint(m.sum(x[i, j] for i in range_nodes) == 1) for j in range_nodes]
+    m.add_sum_constraints([x[i][x[i] >= 0] for i in range_nodes], 1, 1, [row_tag([i], 1, 0) for i in range_nodes])
+    m.add_sum_constraints([x[:, j][x[:, j] >= 0] for j in range_nodes], 1, 1, [row_tag([j], 0, 1) for j in range_nodes])
     # delete sub-tour with less of 3 nodes
-    [m.add_constraint(m.sum([x[i, j], x[j, i]]) <= 1) for j in range_nodes for i in range_nodes]
-    # No loop from the same node
-    [m.add_constraint(x[i, i] == 0) for i in range_nodes]
+    tails, heads = np.triu_indices(len(range_nodes), 1)
+    pairs = np.column_stack([x[tails, heads], x[heads, tails]])
+    m.add_sum_constraints(pairs[(pairs >= 0).all(axis=1)], -np.inf, 1)
 
 
 def add_cut_constraint(m, x, paths, constraints, range_nodes):
     """
     Add cut constraints
     :param m: the model
-    :param x: the binary var matrix
-    :param paths: the path list
+    :param x: the variable index matrix
+    :param paths: the paths of the solution
     :param constraints: a constraints list
+    :param range_nodes: an iterator from 0 to #nodes-1
     :return:
     """
     for s, t in constraints:
         if s is not None and t is not None:
-            p2 = find_path_by_node(paths, t)
-            nodes_without_p2 = list(set(range_nodes) - set(p2))
-            m.add_constraint(m.sum([m.sum([x[i, j], x[j, i]]) for i in nodes_without_p2 for j in p2]) >= 2)
+            add_cut_set_constraints(m, x, [paths.path_of(t)], range_nodes)
+
+
+def add_cut_set_constraints(m, x, cut_sets, range_nodes):
+    """
+    Add a subtour elimination constraint for each node set, all in one call, each one in its sparser form
+    :param m: the model
+    :param x: the variable index matrix
+    :param cut_sets: a list of node lists
+    :param range_nodes: an iterator from 0 to #nodes-1
+    :return:
+    """
+    if len(cut_sets) == 0:
+        return
+    rows, lb, ub, tags = zip(*[subtour_row(x, p2, range_nodes) for p2 in cut_sets])
+    m.add_sum_constraints(rows, lb, ub, tags)
+
+
+def subtour_row(x, p2, range_nodes):
+    """
+    Get the subtour elimination constraint of a node set S in the form with less terms: the cut set form (at least 2
+    arcs cross the cut) or the in set form (at most |S| - 1 arcs inside S, or inside the complement of S)
+    :param x: the variable index matrix
+    :param p2: the node list
+    :param range_nodes: an iterator from 0 to #nodes-1
+    :return: the columns, the lower bound, the upper bound and the tag of the constraint
+    """
+    inside = np.zeros(len(range_nodes), dtype=bool)
+    inside[p2] = True
+    # The smaller side has the sparser in set form
+    side = inside if inside.sum() <= len(inside) / 2 else ~inside
+    columns = x[np.ix_(side, side)].ravel()
+    columns = columns[columns >= 0]
+    cut = cut_set_row(x, p2, range_nodes)
+    if len(cut) <= len(columns):
+        return cut, 2, np.inf, row_tag(p2, 1, 1)
+    return columns, -np.inf, side.sum() - 1, row_tag(np.flatnonzero(side), 0, 0, 1)
+
+
+def cut_set_row(x, p2, range_nodes):
+    """
+    Get the columns of the cut constraint of a node set
+    :param x: the variable index matrix
+    :param p2: the node list
+    :param range_nodes: an iterator from 0 to #nodes-1
+    :return: a numpy array with the columns of the arcs that cross the cut
+    """
+    inside = np.zeros(len(range_nodes), dtype=bool)
+    inside[p2] = True
+    columns = np.concatenate([x[np.ix_(~inside, inside)].ravel(), x[np.ix_(inside, ~inside)].ravel()])
+    return columns[columns >= 0]
+
+
+def tour_to_values(tour, x):
+    """
+    Get the values of the variables that correspond to a tour
+    :param tour: a numpy array with the nodes in visiting order
+    :param x: the variable index matrix
+    :return: a numpy array with the value of each variable (None if an edge of the tour has no variable)
+    """
+    tails, heads = tour, np.roll(tour, -1)
+    columns = np.where(x[tails, heads] >= 0, x[tails, heads], x[heads, tails])
+    if np.any(columns < 0):
+        return None
+    values = np.zeros(x.max() + 1)
+    values[columns] = 1
+    return values
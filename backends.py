@@ -0,0 +1,247 @@
+"""
+Copyright (c) 2021 Mauro Marini
+
+Permission is hereby granted, free of charge, to any person
+obtaining a copy of this software and associated documentation
+files (the "Software"), to deal in the Software without
+restriction, including without limitation the rights to use,
+copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following
+conditions:
+
+The above copyright notice and this permission notice shall be
+included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import numpy as np
+from scipy.optimize import Bounds, LinearConstraint, linprog, milp
+from scipy.sparse import csr_matrix, vstack
+
+import conf
+
+
+def create_backend(name, costs):
+    """
+    Create the model with the backend selected in the configuration
+    :param name: the name of the model
+    :param costs: a numpy array with the cost of each variable (all the variables are binary)
+    :return: the backend model
+    """
+    if conf.solver_params['backend'] == 'docplex':
+        # CPLEX is only required when it is selected
+        from docplex_backend import DocplexBackend
+        return DocplexBackend(name, costs)
+    return HighsBackend(name, costs)
+
+
+class HighsBackend:
+    """
+    Model solved with HiGHS through scipy.optimize.milp, the constraints are stored as a sparse matrix
+    """
+
+    supports_callbacks = False
+
+    def __init__(self, name, costs):
+        """
+        Constructor
+        :param name: the name of the model
+        :param costs: a numpy array with the cost of each variable
+        """
+        self.name = name
+        self.__costs = np.asarray(costs, dtype=float)
+        # Columns not fixed to zero, the others are dropped from the solved problem
+        self.__active = np.ones(len(self.__costs), dtype=bool)
+        self.__indices = []
+        self.__lengths = []
+        self.__lb = []
+        self.__ub = []
+        self.__result = None
+        self.row_tags = []
+
+    def add_sum_constraints(self, rows, lb, ub, tags=None):
+        """
+        Add a constraint lb <= sum(x[c] for c in row) <= ub for each row
+        :param rows: a list of arrays, each one with the columns of a constraint
+        :param lb: the lower bound of the constraints (-numpy.inf if none), or a list with the bound of each row
+        :param ub: the upper bound of the constraints (numpy.inf if none), or a list with the bound of each row
+        :param tags: a list with a description of each row, kept in row_tags (None for no description)
+        :return: a numpy array with the indices of the new constraints
+        """
+        first = len(self.__lengths)
+        for row in rows:
+            self.__indices.append(np.asarray(row, dtype=int))
+            self.__lengths.append(len(row))
+        self.__lb.extend(np.broadcast_to(lb, len(rows)).tolist())
+        self.__ub.extend(np.broadcast_to(ub, len(rows)).tolist())
+        self.row_tags.extend([None] * len(rows) if tags is None else tags)
+        return np.arange(first, len(self.__lengths))
+
+    def add_variables(self, costs):
+        """
+        Add binary variables, not used by any constraint yet
+        :param costs: a numpy array with the cost of each new variable
+        :return: a numpy array with the columns of the new variables
+        """
+        first = len(self.__costs)
+        self.__costs = np.concatenate([self.__costs, np.asarray(costs, dtype=float)])
+        self.__active = np.concatenate([self.__active, np.ones(len(costs), dtype=bool)])
+        return np.arange(first, len(self.__costs))
+
+    def fix_to_zero(self, columns):
+        """
+        Fix variables to zero, they are dropped from the problem given to HiGHS
+        :param columns: a numpy array with the columns of the variables
+        :return:
+        """
+        self.__active[columns] = False
+
+    def __expand(self, values):
+        """
+        Get the values of all the variables from the values of the active ones
+        :param values: a numpy array with the values of the active variables (None if no solution)
+        :return: a numpy array with the value of each variable (None if no solution)
+        """
+        if values is None:
+            return None
+        expanded = np.zeros(len(self.__costs))
+        expanded[self.__active] = values
+        return expanded
+
+    def add_to_constraints(self, constraints, columns):
+        """
+        Add the variable columns[k] with coefficient 1 to the constraint constraints[k], for each k
+        :param constraints: a numpy array with the indices of the constraints
+        :param columns: a numpy array with the columns of the variables
+        :return:
+        """
+        order = np.argsort(constraints, kind='stable')
+        constraints, columns = np.asarray(constraints)[order], np.asarray(columns)[order]
+        for row, block in zip(*np.unique(constraints, return_index=True)):
+            end = np.searchsorted(constraints, row, side='right')
+            self.__indices[row] = np.concatenate([self.__indices[row], columns[block:end]])
+            self.__lengths[row] = len(self.__indices[row])
+
+    def __constraint_matrix(self):
+        """
+        Build the sparse constraint matrix
+        :return: a csr matrix with a row for each constraint
+        """
+        indices = np.concatenate(self.__indices) if self.__indices else np.zeros(0, dtype=int)
+        indptr = np.concatenate([[0], np.cumsum(self.__lengths)])
+        return csr_matrix((np.ones(len(indices)), indices, indptr), shape=(len(self.__lengths), len(self.__costs)))
+
+    def enable_warm_start(self):
+        """
+        scipy doesn't expose the HiGHS warm start: each solve starts from scratch
+        :return:
+        """
+
+    def add_mip_start(self, values):
+        """
+        scipy doesn't expose the HiGHS MIP start: the start is ignored
+        :param values: the values of the variables
+        :return:
+        """
+
+    def clear_mip_starts(self):
+        """
+        Remove all the MIP starts
+        :return:
+        """
+
+    def solve(self, time_limit=None, gap=None):
+        """
+        Solve the model
+        :param time_limit: the maximum solve time in seconds (None for no limit)
+        :param gap: the relative optimality gap at which the solve stops (None for the solver default)
+        :return: a numpy array with the value of each variable, None if no solution has been found
+        """
+        options = {'disp': conf.solver_params['solver_log']}
+        if time_limit is not None:
+            options['time_limit'] = time_limit
+        if gap is not None:
+            options['mip_rel_gap'] = gap
+        constraints = LinearConstraint(self.__constraint_matrix()[:, self.__active], self.__lb, self.__ub)
+        self.__result = milp(self.__costs[self.__active], integrality=np.ones(self.__active.sum()),
+                             bounds=Bounds(0, 1), constraints=constraints, options=options)
+        return self.__expand(self.__result.x)
+
+    def solve_relaxation(self, time_limit=None):
+        """
+        Solve the linear relaxation of the model
+        :param time_limit: the maximum solve time in seconds (None for no limit)
+        :return: a numpy array with the value of each variable, the objective value, a numpy array with the dual
+        value of each constraint and a numpy array with the reduced cost of each variable (None if the relaxation
+        can't be solved to optimality within the time limit)
+        """
+        matrix = self.__constraint_matrix()
+        active = matrix[:, self.__active]
+        lb, ub = np.array(self.__lb, dtype=float), np.array(self.__ub, dtype=float)
+        # linprog takes the constraints as A_eq x == b_eq and A_ub x <= b_ub
+        equal = lb == ub
+        upper = ~equal & np.isfinite(ub)
+        lower = ~equal & np.isfinite(lb)
+        result = linprog(self.__costs[self.__active], A_ub=vstack([active[upper], -active[lower]]),
+                         b_ub=np.concatenate([ub[upper], -lb[lower]]), A_eq=active[equal], b_eq=lb[equal],
+                         bounds=(0, 1), method='highs',
+                         options={} if time_limit is None else {'time_limit': time_limit})
+        if result.status != 0:
+            return None
+        duals = np.zeros(len(lb))
+        duals[equal] = result.eqlin.marginals
+        duals[upper] += result.ineqlin.marginals[:upper.sum()]
+        duals[lower] -= result.ineqlin.marginals[upper.sum():]
+        return self.__expand(result.x), result.fun, duals, self.__costs - matrix.T @ duals
+
+    @property
+    def num_variables(self):
+        """
+        Get the number of variables not fixed to zero
+        :return: the number of variables
+        """
+        return int(self.__active.sum())
+
+    @property
+    def num_constraints(self):
+        """
+        Get the number of constraints
+        :return: the number of constraints
+        """
+        return len(self.__lengths)
+
+    @property
+    def objective_value(self):
+        """
+        Get the objective value of the last solution
+        :return: the objective value
+        """
+        return self.__result.fun
+
+    @property
+    def best_bound(self):
+        """
+        Get the lower bound proven by the last solve
+        :return: the best bound (-numpy.inf if none)
+        """
+        bound = self.__result.get('mip_dual_bound')
+        if bound is None:
+            return self.__result.fun if self.__result.status == 0 else -np.inf
+        return bound
+
+    def report(self):
+        """
+        Print the result of the last solve
+        :return:
+        """
+        print('* model ' + self.name + ' solved with objective = ' + str(self.__result.fun))
+        print(self.__result.message)
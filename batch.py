@@ -0,0 +1,147 @@
+"""
+Copyright (c) 2021 Mauro Marini
+
+Permission is hereby granted, free of charge, to any person
+obtaining a copy of this software and associated documentation
+files (the "Software"), to deal in the Software without
+restriction, including without limitation the rights to use,
+copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following
+conditions:
+
+The above copyright notice and this permission notice shall be
+included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+
+import argparse
+import glob
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+import conf
+import profiler
+from cut_pool import create_cut_pool, save_cut_pool
+from load_dataset import load_costs_matrix
+from solver import solve_tsp
+
+# Instance files solved when a directory is given
+INSTANCE_PATTERNS = ('*.dat', '*.tsp')
+
+
+def find_instances(paths):
+    """
+    Get the instance files given directories, glob patterns or file names
+    :param paths: a list of strings
+    :return: the sorted list of the instance files
+    """
+    instances = set()
+    for path in paths:
+        if os.path.isdir(path):
+            for pattern in INSTANCE_PATTERNS:
+                instances.update(glob.glob(os.path.join(path, pattern)))
+        else:
+            instances.update(glob.glob(path))
+    return sorted(instances)
+
+
+def init_worker(verbose):
+    """
+    Configure a worker process, the modules stay imported for all the instances it solves
+    :param verbose: the value of VERBOSE in the worker
+    :return:
+    """
+    conf.VERBOSE = verbose
+    # The totals of the profiler go to the results file
+    conf.profiling_params['output'] = None
+
+
+def solve_instance(filename, time_limit, gap):
+    """
+    Load and solve an instance (executed by the workers of the pool)
+    :param filename: the name of the instance file
+    :param time_limit: the wall clock budget in seconds (None for no limit)
+    :param gap: the relative optimality gap at which the search stops
+    :return: a dict with the result, ready to be written as JSON
+    """
+    try:
+        costs = load_costs_matrix(filename)
+        pool = create_cut_pool(filename, len(costs))
+        incumbent = solve_tsp(costs, time_limit, gap, pool)
+        save_cut_pool(pool, filename)
+    except Exception as e:
+        return {'instance': filename, 'error': type(e).__name__ + ': ' + str(e)}
+    return {
+        'instance': filename,
+        'nodes': len(costs),
+        'cost': to_json_number(incumbent.cost),
+        'lower_bound': to_json_number(incumbent.lower_bound),
+        'gap': to_json_number(incumbent.gap),
+        'tour': None if incumbent.tour is None else incumbent.tour.tolist(),
+        'iterations': incumbent.iterations,
+        'cuts': incumbent.cuts,
+        'timings': incumbent.timings,
+        'profile': profiler.current.totals() if profiler.current.enabled else None
+    }
+
+
+def to_json_number(value):
+    """
+    Convert a numpy number to a JSON number
+    :param value: the number
+    :return: an int or a float, None for infinite values
+    """
+    if not np.isfinite(value):
+        return None
+    return int(value) if float(value).is_integer() else float(value)
+
+
+def run_batch(instances, output, workers=None, time_limit=None, gap=0):
+    """
+    Solve the instances on a pool of processes and write a JSON line to the output as soon as each one is solved
+    :param instances: a list of instance files
+    :param output: a writable text file
+    :param workers: the number of processes (None for all the cores)
+    :param time_limit: the wall clock budget of each instance in seconds (None for no limit)
+    :param gap: the relative optimality gap at which the search of each instance stops
+    :return: the number of instances solved without errors
+    """
+    solved = 0
+    with ProcessPoolExecutor(workers, initializer=init_worker, initargs=(False,)) as pool:
+        futures = [pool.submit(solve_instance, filename, time_limit, gap) for filename in instances]
+        for future in as_completed(futures):
+            result = future.result()
+            solved += 'error' not in result
+            output.write(json.dumps(result) + '\n')
+            output.flush()
+    return solved
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Solve many TSP instances in parallel, one JSON line per instance')
+    parser.add_argument('paths', nargs='+', help='instance files, directories or glob patterns')
+    parser.add_argument('-o', '--output', help='JSON Lines file (standard output if not given)')
+    parser.add_argument('-w', '--workers', type=int, help='worker processes (all the cores if not given)')
+    parser.add_argument('-t', '--time-limit', type=float, default=conf.solver_params['time_limit'],
+                        help='time budget of each instance in seconds')
+    parser.add_argument('-g', '--gap', type=float, default=conf.solver_params['gap'],
+                        help='relative optimality gap of each instance')
+    args = parser.parse_args()
+    files = find_instances(args.paths)
+    with (open(args.output, 'a') if args.output else sys.stdout) as out:
+        count = run_batch(files, out, args.workers, args.time_limit, args.gap)
+    print('solved ' + str(count) + '/' + str(len(files)) + ' instances', file=sys.stderr)
@@ -0,0 +1,212 @@
+"""
+Copyright (c) 2021 Mauro Marini
+
+Permission is hereby granted, free of charge, to any person
+obtaining a copy of this software and associated documentation
+files (the "Software"), to deal in the Software without
+restriction, including without limitation the rights to use,
+copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following
+conditions:
+
+The above copyright notice and this permission notice shall be
+included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+
+import argparse
+import json
+import os
+import resource
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import conf
+from batch import find_instances, init_worker, solve_instance
+from load_dataset import load_optimal_cost
+from tsplib import write_instance
+
+# Sizes of the random Euclidean instances
+SYNTHETIC_SIZES = (100, 250, 500, 1000)
+# Side of the square of the random instances
+SYNTHETIC_SIDE = 10000
+# Directory of the random instances
+SYNTHETIC_DIR = 'dataset/synthetic'
+# Maximum ratio between the time of an instance and its baseline time
+SLOWDOWN_THRESHOLD = 1.5
+# Instances faster than this (in seconds) are never reported as slower, their time is mostly noise
+MIN_TIME = 0.1
+# Tolerance on the optimal cost
+EPSILON = 1e-6
+
+
+def create_synthetic_instances(sizes=SYNTHETIC_SIZES, directory=SYNTHETIC_DIR, seed=0):
+    """
+    Write the random Euclidean instances (uniform points in a square), the same seed gives the same instances
+    :param sizes: the number of nodes of each instance
+    :param directory: the directory of the instances
+    :param seed: the seed of the random generator
+    :return: the list of the instance files
+    """
+    os.makedirs(directory, exist_ok=True)
+    instances = []
+    for nodes in sizes:
+        filename = os.path.join(directory, 'random' + str(nodes) + '_' + str(seed) + '.tsp')
+        if not os.path.exists(filename):
+            coordinates = np.random.default_rng([seed, nodes]).uniform(0, SYNTHETIC_SIDE, (nodes, 2)).round(1)
+            write_instance(filename, coordinates, os.path.basename(filename)[:-len('.tsp')])
+        instances.append(filename)
+    return instances
+
+
+def benchmark_instance(filename, time_limit, gap):
+    """
+    Solve an instance in a fresh process and measure it (executed by the pool, one process per instance so that the
+    peak memory is the one of the instance)
+    :param filename: the name of the instance file
+    :param time_limit: the wall clock budget in seconds (None for no limit)
+    :param gap: the relative optimality gap at which the search stops
+    :return: a dict with the result of batch.solve_instance, the peak RSS in MB and the check of the optimal cost
+    """
+    conf.profiling_params['enabled'] = True
+    result = solve_instance(filename, time_limit, gap)
+    # ru_maxrss is in KB on Linux
+    result['peak_rss_mb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    result['optimal_cost'] = load_optimal_cost(filename)
+    result['correct'] = is_correct(result)
+    return result
+
+
+def is_correct(result):
+    """
+    Check the cost of a solved instance against its optimal cost
+    :param result: the result of the instance
+    :return: False if the cost is wrong, True otherwise (also when the optimal cost is not known)
+    """
+    if 'error' in result:
+        return False
+    if result['optimal_cost'] is None or result['cost'] is None:
+        return True
+    if result['gap'] == 0:
+        # Proven optimal: the cost must be the optimal one
+        return abs(result['cost'] - result['optimal_cost']) <= EPSILON
+    # Stopped early: the bounds must contain the optimal cost
+    lower_bound = -np.inf if result['lower_bound'] is None else result['lower_bound']
+    return lower_bound - EPSILON <= result['optimal_cost'] <= result['cost'] + EPSILON
+
+
+def compare_with_baseline(result, baseline, threshold=SLOWDOWN_THRESHOLD):
+    """
+    Compare the time of an instance with its baseline time
+    :param result: the result of the instance
+    :param baseline: the dict of the baseline results, by instance name
+    :param threshold: the maximum ratio between the time and the baseline time
+    :return: the ratio (None if the instance has no baseline) and True if the instance is too slow
+    """
+    reference = baseline.get(os.path.basename(result['instance']))
+    if reference is None or 'error' in result:
+        return None, False
+    slowdown = result['timings']['total'] / max(reference['time'], 1e-9)
+    return slowdown, slowdown > threshold and result['timings']['total'] > MIN_TIME
+
+
+def load_baseline(filename):
+    """
+    Load the baseline results
+    :param filename: the name of the baseline file (JSON)
+    :return: a dict with the time and the cost of each instance, by instance name (empty if the file doesn't exist)
+    """
+    if filename is None or not os.path.exists(filename):
+        return {}
+    with open(filename, 'r') as f:
+        return json.load(f)
+
+
+def save_baseline(results, filename):
+    """
+    Save the results as the new baseline
+    :param results: the list of the results
+    :param filename: the name of the baseline file (JSON)
+    :return:
+    """
+    baseline = {os.path.basename(r['instance']): {'time': r['timings']['total'], 'cost': r['cost']}
+                for r in results if 'error' not in r}
+    with open(filename, 'w') as f:
+        json.dump(baseline, f, indent=1, sort_keys=True)
+
+
+def run_benchmark(instances, time_limit=None, gap=0, baseline=None, threshold=SLOWDOWN_THRESHOLD, output=None):
+    """
+    Solve the instances one at a time (each in its own process) and check them
+    :param instances: the list of the instance files
+    :param time_limit: the wall clock budget of each instance in seconds (None for no limit)
+    :param gap: the relative optimality gap at which the search of each instance stops
+    :param baseline: the dict of the baseline results (None for no comparison)
+    :param threshold: the maximum ratio between the time of an instance and its baseline time
+    :param output: a writable text file for the JSON line of each instance (None for no file)
+    :return: the list of the results and the list of the failures (strings)
+    """
+    results, failures = [], []
+    print('%-24s %6s %12s %12s %9s %8s %6s %7s %9s %8s' % ('instance', 'nodes', 'cost', 'optimal', 'gap', 'time',
+                                                           'iter', 'cuts', 'rss (MB)', 'vs base'))
+    for filename in instances:
+        # One process per instance: the peak RSS is not shared between instances
+        with ProcessPoolExecutor(1, initializer=init_worker, initargs=(False,)) as pool:
+            result = pool.submit(benchmark_instance, filename, time_limit, gap).result()
+        name = os.path.basename(filename)
+        if 'error' in result:
+            failures.append(name + ': ' + result['error'])
+            print('%-24s %s' % (name, result['error']))
+            continue
+        slowdown, slower = compare_with_baseline(result, baseline or {}, threshold)
+        result['slowdown'] = slowdown
+        if not result['correct']:
+            failures.append(name + ': cost ' + str(result['cost']) + ' instead of ' + str(result['optimal_cost']))
+        if slower:
+            failures.append(name + ': ' + '%.2f' % slowdown + 'x slower than the baseline')
+        print('%-24s %6d %12s %12s %9.2g %8.2f %6d %7d %9.1f %8s' % (
+            name, result['nodes'], result['cost'], result['optimal_cost'], np.nan if result['gap'] is None else
+            result['gap'], result['timings']['total'], result['iterations'], result['cuts'], result['peak_rss_mb'],
+            '-' if slowdown is None else '%.2fx' % slowdown))
+        results.append(result)
+        if output is not None:
+            output.write(json.dumps(result) + '\n')
+            output.flush()
+    return results, failures
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the solver on the bundled and on random instances')
+    parser.add_argument('paths', nargs='*', default=['dataset'], help='instance files, directories or glob patterns')
+    parser.add_argument('-s', '--sizes', type=int, nargs='*', default=list(SYNTHETIC_SIZES),
+                        help='nodes of the random Euclidean instances (none to skip them)')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the random instances')
+    parser.add_argument('-t', '--time-limit', type=float, default=60, help='time budget of each instance in seconds')
+    parser.add_argument('-g', '--gap', type=float, default=0, help='relative optimality gap of each instance')
+    parser.add_argument('-b', '--baseline', default='benchmark_baseline.json', help='baseline file (JSON)')
+    parser.add_argument('--save-baseline', action='store_true', help='save the results as the new baseline')
+    parser.add_argument('--threshold', type=float, default=SLOWDOWN_THRESHOLD,
+                        help='maximum ratio between the time of an instance and its baseline time')
+    parser.add_argument('-o', '--output', help='JSON Lines file with the result of each instance')
+    args = parser.parse_args()
+    files = find_instances(args.paths) + create_synthetic_instances(args.sizes, seed=args.seed)
+    with open(args.output, 'w') if args.output else open(os.devnull, 'w') as out:
+        all_results, all_failures = run_benchmark(files, args.time_limit, args.gap, load_baseline(args.baseline),
+                                                  args.threshold, out)
+    if args.save_baseline:
+        save_baseline(all_results, args.baseline)
+    for failure in all_failures:
+        print('FAILED ' + failure, file=sys.stderr)
+    sys.exit(1 if all_failures else 0)
@@ -26,7 +26,63 @@ OTHER DEALINGS IN THE SOFTWARE.
 
 loading_params = {
     'symmetric_costs': True,
-    'maintain_maximum_cost': False
+    'maintain_maximum_cost': False,
+    # Cache the parsed matrix in a binary file next to the instance and memory map it
+    'cache': True
+}
+
+solver_params = {
+    # Instances with at most this many nodes are solved by Held-Karp dynamic programming, without any solver
+    'held_karp_nodes': 12,
+    # 'highs': HiGHS through scipy / 'docplex': CPLEX (the community edition is limited to 1000 variables)
+    'backend': 'highs',
+    # 'symmetric': a variable for each undirected edge (requires symmetric costs) / 'directed': assignment model
+    'formulation': 'symmetric',
+    # Sparse model: the edges to the k nearest neighbours of each node, the others are added by reduced cost pricing
+    # (None for a variable for each edge)
+    'candidates': None,
+    # 'callback': single solve with lazy constraints (docplex only) / 'resolve': solve again after each round of cuts
+    'mode': 'callback',
+    # Two phase: cut the linear relaxation with exact min cut separation until no cut is violated, then solve the
+    # binary model
+    'two_phase': True,
+    # Fix to zero the variables whose reduced cost in the linear relaxation is greater than the gap to the best tour,
+    # before the solve and after each round of cuts of the 'resolve' mode
+    'reduced_cost_fixing': True,
+    # Warm start each solve of the 'resolve' mode from the previous incumbent and basis
+    'warm_start': True,
+    # Merge the subtours of each solution of the 'resolve' mode into a tour (Karp patching and local search), the best
+    # one is the incumbent
+    'patching': True,
+    # Wall clock budget in seconds (None for no limit), the best tour found is returned when it is over
+    'time_limit': None,
+    # Relative optimality gap at which the search stops
+    'gap': 0,
+    # Print the log of the solver (HiGHS or CPLEX)
+    'solver_log': False
+}
+
+separation_params = {
+    # 'gomory_hu': all the violated cuts of the cut tree / 'parallel': the s-t max flow to every other node on a
+    # process pool / 'single_sink': one s-t max flow per iteration
+    'method': 'gomory_hu',
+    # Processes of the 'parallel' method (None for all the cores), a single one inside the workers of batch runs
+    'workers': None,
+    # Keep the cuts in a pool that filters the duplicates and ages out the ones that stay slack
+    'cut_pool': True,
+    # Solves in a row a cut can stay slack before leaving the pool (only in the 'resolve' mode, the 'callback' mode
+    # makes a single solve)
+    'cut_age_limit': 10,
+    # Save the pool next to the instance and seed the next solve of the instance with it
+    'save_cut_pool': False
+}
+
+profiling_params = {
+    # Record the time of each stage and the counters of each iteration of the cutting plane loop
+    'enabled': False,
+    # File where the records are saved at the end of the solve: CSV if it ends with .csv, JSON otherwise
+    # (None for no file)
+    'output': None
 }
 
 VERBOSE = True
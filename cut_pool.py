@@ -0,0 +1,184 @@
+"""
+Copyright (c) 2021 Mauro Marini
+
+Permission is hereby granted, free of charge, to any person
+obtaining a copy of this software and associated documentation
+files (the "Software"), to deal in the Software without
+restriction, including without limitation the rights to use,
+copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following
+conditions:
+
+The above copyright notice and this permission notice shall be
+included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+
+import os
+
+import numpy as np
+
+import conf
+
+# Solves in a row a cut can stay slack before leaving the pool
+AGE_LIMIT = 10
+# A cut is slack if the capacity across it exceeds 2 by more than this
+EPSILON = 1e-6
+# Extension of the pool files saved next to the instances
+POOL_EXTENSION = '.cuts.npz'
+
+
+class CutPool:
+    """
+    Subtour cuts stored as node set bitmasks (the side without node 0), with a hash index of the packed bitmasks to
+    find the duplicates in O(1)
+    """
+
+    def __init__(self, nodes, age_limit=AGE_LIMIT):
+        """
+        Constructor
+        :param nodes: the number of nodes of the instance
+        :param age_limit: the number of solves in a row a cut can stay slack before leaving the pool
+        """
+        self.nodes = nodes
+        self.age_limit = age_limit
+        self.masks = np.zeros((0, nodes), dtype=bool)
+        self.ages = np.zeros(0, dtype=int)
+        self.index = {}
+
+    def __len__(self):
+        """
+        Get the number of cuts in the pool
+        :return: the number of cuts
+        """
+        return len(self.masks)
+
+    def canonical_mask(self, node_set):
+        """
+        Get the bitmask of a cut, S and its complement give the same cut
+        :param node_set: the node list of one side of the cut
+        :return: a boolean numpy array, True for the nodes on the side without node 0
+        """
+        mask = np.zeros(self.nodes, dtype=bool)
+        mask[node_set] = True
+        return ~mask if mask[0] else mask
+
+    def add(self, cut_sets):
+        """
+        Add the cuts that are not in the pool yet
+        :param cut_sets: a list of node lists
+        :return: the list of the node lists that were not in the pool
+        """
+        new_sets, new_masks = [], []
+        for node_set in cut_sets:
+            mask = self.canonical_mask(node_set)
+            key = np.packbits(mask).tobytes()
+            if key not in self.index:
+                self.index[key] = len(self.masks) + len(new_masks)
+                new_sets.append(node_set)
+                new_masks.append(mask)
+        if new_masks:
+            self.masks = np.vstack([self.masks, new_masks])
+            self.ages = np.concatenate([self.ages, np.zeros(len(new_masks), dtype=int)])
+        return new_sets
+
+    def cut_sets(self):
+        """
+        Get the cuts of the pool
+        :return: a list of node lists (the side without node 0)
+        """
+        return [np.flatnonzero(mask).tolist() for mask in self.masks]
+
+    def update_ages(self, capacity, threshold=2):
+        """
+        Age the cuts that are slack in a solution, reset the age of the tight ones and remove the cuts older than
+        the age limit (called after each solve of the 'resolve' mode: in the 'callback' mode the cuts never age)
+        :param capacity: a symmetric numpy array with the capacity of each edge in the solution
+        :param threshold: the right hand side of the cuts
+        :return: the number of cuts removed
+        """
+        if len(self.masks) == 0:
+            return 0
+        inside = self.masks.astype(float)
+        # Capacity from the nodes of each set to the others
+        crossing = ((inside @ capacity) * (1 - inside)).sum(axis=1)
+        self.ages = np.where(crossing > threshold + EPSILON, self.ages + 1, 0)
+        keep = self.ages <= self.age_limit
+        removed = len(keep) - keep.sum()
+        if removed:
+            self.masks, self.ages = self.masks[keep], self.ages[keep]
+            self.index = {np.packbits(mask).tobytes(): i for i, mask in enumerate(self.masks)}
+        return removed
+
+    def save(self, filename):
+        """
+        Save the cuts of the pool (a loaded pool starts with all the ages at zero)
+        :param filename: the name of the pool file
+        :return:
+        """
+        with open(filename, 'wb') as f:
+            np.savez_compressed(f, nodes=self.nodes, masks=np.packbits(self.masks, axis=1))
+
+
+def get_pool_filename(instance, nodes):
+    """
+    Get the name of the pool file of an instance, keyed by its name and its number of nodes (and not by the hash of
+    its content, so that the pool is still found when the costs change)
+    :param instance: the name of the instance file
+    :param nodes: the number of nodes
+    :return: the name of the pool file
+    """
+    return instance + '.' + str(nodes) + POOL_EXTENSION
+
+
+def create_cut_pool(instance, nodes):
+    """
+    Create the cut pool of an instance as set in the configuration
+    :param instance: the name of the instance file
+    :param nodes: the number of nodes
+    :return: the pool (loaded from the pool file of the instance if the pools are saved), None for no pool
+    """
+    if not conf.separation_params['cut_pool']:
+        return None
+    if conf.separation_params['save_cut_pool']:
+        return load_cut_pool(instance, nodes, conf.separation_params['cut_age_limit'])
+    return CutPool(nodes, conf.separation_params['cut_age_limit'])
+
+
+def load_cut_pool(instance, nodes, age_limit=AGE_LIMIT):
+    """
+    Load the pool saved for an instance
+    :param instance: the name of the instance file
+    :param nodes: the number of nodes
+    :param age_limit: the number of solves in a row a cut can stay slack before leaving the pool
+    :return: the pool (empty if no pool was saved for the instance)
+    """
+    pool = CutPool(nodes, age_limit)
+    filename = get_pool_filename(instance, nodes)
+    if os.path.exists(filename):
+        with np.load(filename) as saved:
+            if int(saved['nodes']) == nodes:
+                masks = np.unpackbits(saved['masks'], axis=1, count=nodes).astype(bool)
+                pool.add([np.flatnonzero(mask).tolist() for mask in masks])
+    return pool
+
+
+def save_cut_pool(pool, instance):
+    """
+    Save the pool of an instance, if the pools are saved in the configuration
+    :param pool: the pool (None for no pool)
+    :param instance: the name of the instance file
+    :return:
+    """
+    if pool is not None and conf.separation_params['save_cut_pool']:
+        pool.save(get_pool_filename(instance, pool.nodes))
@@ -0,0 +1,365 @@
+"""
+Copyright (c) 2021 Mauro Marini
+
+Permission is hereby granted, free of charge, to any person
+obtaining a copy of this software and associated documentation
+files (the "Software"), to deal in the Software without
+restriction, including without limitation the rights to use,
+copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following
+conditions:
+
+The above copyright notice and this permission notice shall be
+included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import time
+
+import numpy as np
+
+import conf
+import profiler
+from assignment import add_cut_set_constraints, subtour_row, tour_to_values, use_symmetric_model
+from heuristic import get_neighbour_lists, patch_subtours, rotate_tour, tour_cost
+from maximum_flow import MaximumFlowSolver
+from pricing import fix_variables
+from separation import separate_cut_sets
+from subpath_finder import get_paths
+from tsplib import CoordinateCosts
+from utils import solution_to_capacity, solution_to_matrix
+
+EPSILON = 1e-6
+
+
+class Incumbent:
+    """
+    Best tour found so far and lower bound of the optimal cost, within a time budget
+    """
+
+    def __init__(self, costs, time_limit=None, gap=0):
+        """
+        Constructor
+        :param costs: the cost matrix
+        :param time_limit: the wall clock budget in seconds (None for no limit)
+        :param gap: the relative optimality gap at which the search stops
+        """
+        self.costs = costs if isinstance(costs, CoordinateCosts) else np.asarray(costs)
+        self.time_limit = time_limit
+        self.target_gap = gap
+        self.start_time = time.time()
+        self.tour = None
+        self.cost = np.inf
+        self.lower_bound = -np.inf
+        # Solves of the model, cuts added and wall clock time of each stage
+        self.iterations = 0
+        self.cuts = 0
+        self.timings = {}
+
+    def update_tour(self, tour):
+        """
+        Keep the tour if it is better than the current one
+        :param tour: a numpy array with the nodes in visiting order
+        :return: True if the tour is the new incumbent
+        """
+        cost = tour_cost(tour, self.costs)
+        if cost >= self.cost:
+            return False
+        self.tour = rotate_tour(tour)
+        self.cost = cost
+        return True
+
+    def update_lower_bound(self, bound):
+        """
+        Raise the lower bound
+        :param bound: a lower bound of the optimal cost
+        :return:
+        """
+        self.lower_bound = max(self.lower_bound, bound)
+
+    @property
+    def gap(self):
+        """
+        Get the relative optimality gap proven so far
+        :return: the gap between the best tour and the lower bound (numpy.inf if no tour)
+        """
+        if self.tour is None:
+            return np.inf
+        return max(self.cost - self.lower_bound, 0) / max(abs(self.cost), 1e-9)
+
+    def elapsed_time(self):
+        """
+        Get the time since the search started
+        :return: the elapsed time in seconds
+        """
+        return time.time() - self.start_time
+
+    def remaining_time(self):
+        """
+        Get the time left in the budget
+        :return: the remaining time in seconds (None for no limit)
+        """
+        if self.time_limit is None:
+            return None
+        return max(self.time_limit - self.elapsed_time(), 0)
+
+    def is_done(self):
+        """
+        Check if the search can stop
+        :return: True if the target gap is reached or the budget is over
+        """
+        return self.gap <= self.target_gap or self.remaining_time() == 0
+
+    def report(self):
+        """
+        Print the bounds
+        :return:
+        """
+        print('lower bound: ' + str(self.lower_bound) + '\tbest tour: ' + str(self.cost) + '\tgap: ' +
+              str(self.gap) + '\telapsed time: ' + str(self.elapsed_time()))
+
+
+def solve_root_relaxation(m, x, range_nodes, incumbent, pool=None):
+    """
+    First phase: solve the linear relaxation and add the subtour cuts found by exact min cut separation on the
+    fractional solution, until no cut has a capacity lower than 2 (the binary model is solved after it)
+    :param m: the model
+    :param x: the variable index matrix
+    :param range_nodes: an iterator from 0 to #nodes-1
+    :param incumbent: the incumbent, its lower bound is raised to the bound of the relaxation
+    :param pool: the cut pool, the cuts already in it are not added again (None for no pool)
+    :return: the incumbent
+    """
+    max_flow = None
+    if conf.separation_params['method'] == 'single_sink':
+        max_flow = MaximumFlowSolver(len(range_nodes), 0, np.add)
+    while incumbent.remaining_time() != 0:
+        profiler.current.start_iteration()
+        profiler.current.set('phase', 1)
+        with profiler.current.stage('relaxation_solve'):
+            relaxation = m.solve_relaxation(incumbent.remaining_time())
+        if relaxation is None:
+            break
+        values, bound, _, _ = relaxation
+        incumbent.update_lower_bound(bound)
+        with profiler.current.stage('solution_extraction'):
+            solution = solution_to_matrix(values, x)
+        with profiler.current.stage('separation'):
+            cut_sets = separate_fractional(solution, max_flow, incumbent.remaining_time())
+        if pool is not None:
+            cut_sets = pool.add(cut_sets)
+        if conf.VERBOSE:
+            print('relaxation: ' + str(bound) + '\t#cuts: ' + str(len(cut_sets)))
+        if not cut_sets:
+            break
+        with profiler.current.stage('cut_addition'):
+            add_cut_set_constraints(m, x, cut_sets, range_nodes)
+        incumbent.cuts += len(cut_sets)
+        profiler.current.count('cuts', len(cut_sets))
+    return incumbent
+
+
+def separate_fractional(solution, max_flow, time_limit=None):
+    """
+    Find the cuts violated by a fractional solution, with the separation method selected in the configuration
+    :param solution: the solution in matrix form
+    :param max_flow: the max flow solver of the previous solutions, used by the 'single_sink' method
+    :param time_limit: the time budget of the separation in seconds (None for no limit)
+    :return: a list of node lists, one for each violated cut (the side that doesn't contain node 0)
+    """
+    if conf.separation_params['method'] != 'single_sink':
+        return separate_cut_sets(solution_to_capacity(solution), time_limit=time_limit)
+    # One max flow at a time, until a sink is separated from node 0 by a cut lower than 2 (the stages are part of the
+    # separation time)
+    start = time.time()
+    with profiler.current.stage('max_flow_build'):
+        max_flow.update(solution)
+    with profiler.current.stage('max_flow_solve'):
+        for _ in range(max_flow.sinks):
+            if time_limit is not None and time.time() - start >= time_limit:
+                break
+            max_flow.solve_max_flow()
+            cut_set = max_flow.export_cut_set()
+            if cut_set is not None:
+                return [cut_set]
+    return []
+
+
+def solve_with_callback(m, x, range_nodes, incumbent, pool=None):
+    """
+    Solve the model once, the subtour cuts are separated inside the branch and bound
+    :param m: the model
+    :param x: the variable index matrix
+    :param range_nodes: an iterator from 0 to #nodes-1
+    :param incumbent: the incumbent, updated with the solution and the bound of the solve
+    :param pool: the cut pool that records the cuts (None for no pool)
+    :return: the incumbent
+    """
+    def separate_node(values):
+        with profiler.current.stage('separation'):
+            cut_sets = separate_cut_sets(solution_to_capacity(solution_to_matrix(values, x)))
+        incumbent.cuts += len(cut_sets)
+        profiler.current.count('separation_calls')
+        profiler.current.count('cuts', len(cut_sets))
+        if pool is not None:
+            # CPLEX can purge the cuts of a node: the violated ones are added again even if already in the pool
+            pool.add(cut_sets)
+        return [subtour_row(x, p2, range_nodes)[:3] for p2 in cut_sets]
+
+    add_tour_start(m, x, incumbent.tour)
+    profiler.current.start_iteration()
+    profiler.current.set('variables', m.num_variables)
+    profiler.current.set('constraints', m.num_constraints)
+    # The separation time is part of the solve time
+    with profiler.current.stage('master_solve'):
+        values = m.solve_with_callbacks(separate_node, incumbent.remaining_time(), incumbent.target_gap)
+    incumbent.iterations += 1
+    if conf.VERBOSE:
+        m.report()
+    incumbent.update_lower_bound(m.best_bound)
+    if values is not None:
+        # The lazy constraints make every solution a single tour
+        paths = get_paths(solution_to_matrix(values, x), use_symmetric_model())
+        incumbent.update_tour(paths.tour())
+    if conf.VERBOSE:
+        incumbent.report()
+    return incumbent
+
+
+def solve_with_resolve(m, x, range_nodes, incumbent, pool=None):
+    """
+    Solve the model again after each round of cuts, until the solution is a single tour, the target gap is reached or
+    the time budget is over
+    :param m: the model
+    :param x: the variable index matrix
+    :param range_nodes: an iterator from 0 to #nodes-1
+    :param incumbent: the incumbent, updated with the solution and the bound of each solve
+    :param pool: the cut pool that filters the duplicated cuts and ages the slack ones (None for no pool)
+    :return: the incumbent
+    """
+    max_flow = None
+    if conf.separation_params['method'] == 'single_sink':
+        max_flow = MaximumFlowSolver(len(range_nodes), 0, np.add)
+    neighbours = get_neighbour_lists(incumbent.costs) if conf.solver_params['patching'] else None
+    if conf.solver_params['warm_start']:
+        m.enable_warm_start()
+    add_tour_start(m, x, incumbent.tour)
+    while not incumbent.is_done():
+        profiler.current.start_iteration()
+        profiler.current.set('variables', m.num_variables)
+        profiler.current.set('constraints', m.num_constraints)
+        # Solve the model, its optimal value is a lower bound of the optimal tour
+        with profiler.current.stage('master_solve'):
+            values = m.solve(incumbent.remaining_time(), incumbent.target_gap)
+        incumbent.iterations += 1
+        if conf.VERBOSE:
+            m.report()
+        incumbent.update_lower_bound(m.best_bound)
+        if values is None:
+            break
+        # Get the solution in matrix form
+        with profiler.current.stage('solution_extraction'):
+            solution = solution_to_matrix(values, x)
+        if pool is not None:
+            with profiler.current.stage('cut_pool'):
+                pool.update_ages(solution_to_capacity(solution))
+        # Get al the paths
+        with profiler.current.stage('path_finding'):
+            paths = get_paths(solution, use_symmetric_model())
+        profiler.current.set('components', len(paths))
+        if conf.VERBOSE:
+            print('#paths: ' + str(len(paths)))
+        # check len paths: a single tour is optimal (within the target gap)
+        if len(paths) == 1:
+            incumbent.update_tour(paths.tour())
+            break
+        if neighbours is not None:
+            # Upper bound from the subtours: merged into a tour, it can close the gap before the next solve
+            with profiler.current.stage('patching'):
+                tour, cost = patch_subtours(list(paths), incumbent.costs, neighbours)
+            if conf.VERBOSE:
+                print('patched tour: ' + str(cost))
+            incumbent.update_tour(tour)
+        incumbent.cuts += separate(m, x, solution, paths, range_nodes, pool, max_flow)
+        if conf.solver_params['reduced_cost_fixing']:
+            # The cuts raise the bound of the relaxation: more variables can be fixed
+            with profiler.current.stage('fixing'):
+                fix_variables(m, incumbent)
+        if conf.VERBOSE:
+            incumbent.report()
+        if conf.solver_params['warm_start']:
+            # The previous incumbent violates the new cuts: the solver repairs it into a feasible start
+            m.clear_mip_starts()
+            m.add_mip_start(values)
+            add_tour_start(m, x, incumbent.tour)
+    if conf.VERBOSE:
+        incumbent.report()
+    return incumbent
+
+
+def add_tour_start(m, x, tour):
+    """
+    Give a tour to the solver as MIP start, if all its edges are in the model
+    :param m: the model
+    :param x: the variable index matrix
+    :param tour: a numpy array with the nodes in visiting order (None for no tour)
+    :return:
+    """
+    if tour is None:
+        return
+    values = tour_to_values(tour, x)
+    if values is not None:
+        m.add_mip_start(values)
+
+
+def separate(m, x, solution, paths, range_nodes, pool=None, max_flow=None):
+    """
+    Add the cuts violated by the current solution
+    :param m: the model
+    :param x: the variable index matrix
+    :param solution: the current solution in matrix form
+    :param paths: the paths of the current solution
+    :param range_nodes: an iterator from 0 to #nodes-1
+    :param pool: the cut pool, the cuts already in it are not added again (None for no pool)
+    :param max_flow: the max flow solver of the previous solutions, used by the 'single_sink' method (None for a new
+    one)
+    :return: the number of cuts added
+    """
+    with profiler.current.stage('separation'):
+        if np.allclose(solution, np.round(solution), atol=EPSILON):
+            # Every component of an integral solution is a violated subtour: cut all of them in one round
+            cut_sets = component_cut_sets(paths)
+        else:
+            # Violated min cuts of the support graph (cut tree, max flow to every node or to the next sinks)
+            if max_flow is None and conf.separation_params['method'] == 'single_sink':
+                max_flow = MaximumFlowSolver(len(range_nodes), 0, np.add)
+            cut_sets = separate_fractional(solution, max_flow)
+    if pool is not None:
+        cut_sets = pool.add(cut_sets)
+    if conf.VERBOSE:
+        print('#cuts: ' + str(len(cut_sets)))
+    with profiler.current.stage('cut_addition'):
+        add_cut_set_constraints(m, x, cut_sets, range_nodes)
+    profiler.current.count('cuts', len(cut_sets))
+    return len(cut_sets)
+
+
+def component_cut_sets(paths):
+    """
+    Get the node sets of the subtours of an integral solution, one for each component
+    :param paths: the paths of the solution
+    :return: a list of node arrays
+    """
+    if len(paths) == 2:
+        # The two sides give the same cut: the one without node 0 is kept
+        return [paths[1 - paths.labels[0]]]
+    return list(paths)
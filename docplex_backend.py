@@ -0,0 +1,283 @@
+"""
+Copyright (c) 2021 Mauro Marini
+
+Permission is hereby granted, free of charge, to any person
+obtaining a copy of this software and associated documentation
+files (the "Software"), to deal in the Software without
+restriction, including without limitation the rights to use,
+copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following
+conditions:
+
+The above copyright notice and this permission notice shall be
+included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import numpy as np
+from cplex.callbacks import LazyConstraintCallback, UserCutCallback
+from docplex.mp.callbacks.cb_mixin import ConstraintCallbackMixin
+from docplex.mp.constants import EffortLevel
+from docplex.mp.model import Model
+from docplex.mp.relax_linear import LinearRelaxer
+from docplex.mp.solution import SolveSolution
+from docplex.util.status import JobSolveStatus
+
+import conf
+
+
+class DocplexBackend:
+    """
+    Model built and solved with docplex (CPLEX)
+    """
+
+    supports_callbacks = True
+
+    def __init__(self, name, costs):
+        """
+        Constructor
+        :param name: the name of the model
+        :param costs: a numpy array with the cost of each variable
+        """
+        self.model = Model(name=name, log_output=conf.solver_params['solver_log'])
+        self.vars = self.model.binary_var_list(len(costs))
+        self.model.minimize(self.model.scal_prod(self.vars, costs))
+        self.constraints = []
+        self.row_tags = []
+
+    def sum_constraint(self, row, lb, ub):
+        """
+        Create (without adding it to the model) the constraint lb <= sum(x[c] for c in row) <= ub
+        :param row: the columns of the constraint
+        :param lb: the lower bound (-numpy.inf if none)
+        :param ub: the upper bound (numpy.inf if none)
+        :return: the constraint
+        """
+        expr = self.model.sum_vars(self.vars[c] for c in row)
+        if lb == ub:
+            return expr == lb
+        if ub == np.inf:
+            return expr >= lb
+        if lb == -np.inf:
+            return expr <= ub
+        return self.model.range_constraint(lb, expr, ub)
+
+    def add_sum_constraints(self, rows, lb, ub, tags=None):
+        """
+        Add a constraint lb <= sum(x[c] for c in row) <= ub for each row
+        :param rows: a list of arrays, each one with the columns of a constraint
+        :param lb: the lower bound of the constraints (-numpy.inf if none), or a list with the bound of each row
+        :param ub: the upper bound of the constraints (numpy.inf if none), or a list with the bound of each row
+        :param tags: a list with a description of each row, kept in row_tags (None for no description)
+        :return: a numpy array with the indices of the new constraints
+        """
+        first = len(self.constraints)
+        bounds = zip(rows, np.broadcast_to(lb, len(rows)), np.broadcast_to(ub, len(rows)))
+        self.constraints += self.model.add_constraints([self.sum_constraint(row, l, u) for row, l, u in bounds])
+        self.row_tags.extend([None] * len(rows) if tags is None else tags)
+        return np.arange(first, len(self.constraints))
+
+    def add_variables(self, costs):
+        """
+        Add binary variables, not used by any constraint yet
+        :param costs: a numpy array with the cost of each new variable
+        :return: a numpy array with the columns of the new variables
+        """
+        first = len(self.vars)
+        new_vars = self.model.binary_var_list(len(costs))
+        self.vars += new_vars
+        for var, cost in zip(new_vars, costs):
+            self.model.objective_expr.add_term(var, float(cost))
+        return np.arange(first, len(self.vars))
+
+    def add_to_constraints(self, constraints, columns):
+        """
+        Add the variable columns[k] with coefficient 1 to the constraint constraints[k], for each k
+        :param constraints: a numpy array with the indices of the constraints
+        :param columns: a numpy array with the columns of the variables
+        :return:
+        """
+        for row, column in zip(constraints, columns):
+            self.constraints[row].left_expr.add_term(self.vars[column], 1)
+
+    def enable_warm_start(self):
+        """
+        Start each solve from the advanced basis of the previous one
+        :return:
+        """
+        self.model.parameters.advance = 1
+
+    def add_mip_start(self, values):
+        """
+        Add a MIP start, CPLEX repairs it if it violates the constraints added after it was found
+        :param values: the values of the variables
+        :return:
+        """
+        start = SolveSolution(self.model, var_value_map=dict(zip(self.vars, values)))
+        self.model.add_mip_start(start, effort_level=EffortLevel.Repair)
+
+    def clear_mip_starts(self):
+        """
+        Remove all the MIP starts
+        :return:
+        """
+        self.model.clear_mip_starts()
+
+    def solve(self, time_limit=None, gap=None):
+        """
+        Solve the model
+        :param time_limit: the maximum solve time in seconds (None for no limit)
+        :param gap: the relative optimality gap at which the solve stops (None for the solver default)
+        :return: a numpy array with the value of each variable, None if no solution has been found
+        """
+        if time_limit is not None:
+            self.model.parameters.timelimit = time_limit
+        if gap is not None:
+            self.model.parameters.mip.tolerances.mipgap = gap
+        solution = self.model.solve()
+        if solution is None:
+            return None
+        return np.array(solution.get_values(self.vars))
+
+    def solve_with_callbacks(self, separate, time_limit=None, gap=None):
+        """
+        Solve the model once, the violated constraints are added inside the branch and bound
+        :param separate: a function that takes the values of the variables and returns the violated constraints as
+        (row, lb, ub) tuples
+        :param time_limit: the maximum solve time in seconds (None for no limit)
+        :param gap: the relative optimality gap at which the solve stops (None for the solver default)
+        :return: a numpy array with the value of each variable, None if no solution has been found
+        """
+        for callback_type in [LazySeparationCallback, UserSeparationCallback]:
+            self.model.register_callback(callback_type).setup(self, separate)
+        return self.solve(time_limit, gap)
+
+    def fix_to_zero(self, columns):
+        """
+        Fix variables to zero, the CPLEX presolve drops them from the problem
+        :param columns: a numpy array with the columns of the variables
+        :return:
+        """
+        for column in columns:
+            self.vars[column].ub = 0
+
+    def solve_relaxation(self, time_limit=None):
+        """
+        Solve the linear relaxation of the model
+        :param time_limit: the maximum solve time in seconds (None for no limit)
+        :return: a numpy array with the value of each variable, the objective value, a numpy array with the dual
+        value of each constraint and a numpy array with the reduced cost of each variable (None if the relaxation
+        can't be solved to optimality within the time limit)
+        """
+        relaxed = LinearRelaxer().linear_relaxation(self.model)
+        if time_limit is not None:
+            relaxed.parameters.timelimit = time_limit
+        solution = relaxed.solve()
+        if solution is None or relaxed.solve_status != JobSolveStatus.OPTIMAL_SOLUTION:
+            return None
+        # The relaxed copy keeps the order of the variables and of the constraints
+        variables = list(relaxed.iter_variables())
+        values = np.array(solution.get_values(variables))
+        duals = np.array(relaxed.dual_values(list(relaxed.iter_linear_constraints())))
+        return values, solution.objective_value, duals, np.array(relaxed.reduced_costs(variables))
+
+    @property
+    def num_variables(self):
+        """
+        Get the number of variables
+        :return: the number of variables
+        """
+        return self.model.number_of_variables
+
+    @property
+    def num_constraints(self):
+        """
+        Get the number of constraints
+        :return: the number of constraints
+        """
+        return self.model.number_of_constraints
+
+    @property
+    def objective_value(self):
+        """
+        Get the objective value of the last solution
+        :return: the objective value
+        """
+        return self.model.objective_value
+
+    @property
+    def best_bound(self):
+        """
+        Get the lower bound proven by the last solve
+        :return: the best bound (-numpy.inf if none)
+        """
+        bound = self.model.solve_details.best_bound
+        return -np.inf if bound is None else bound
+
+    def report(self):
+        """
+        Print the result of the last solve
+        :return:
+        """
+        self.model.report()
+        print(self.model.solve_status)
+
+
+class SeparationMixin(ConstraintCallbackMixin):
+    """
+    Separate the constraints violated by the solution of the current node
+    """
+
+    def setup(self, backend, separate):
+        """
+        Set the separation function
+        :param backend: the backend that owns the model
+        :param separate: a function that takes the values of the variables and returns the violated constraints
+        :return:
+        """
+        self.backend = backend
+        self.separate = separate
+        self.indices = [v.index for v in backend.vars]
+
+    def add_violated_constraints(self):
+        """
+        Add the violated constraints to the current node
+        :return:
+        """
+        for row, lb, ub in self.separate(np.array(self.get_values(self.indices))):
+            self.add(*self.linear_ct_to_cplex(self.backend.sum_constraint(row, lb, ub)))
+
+
+class LazySeparationCallback(SeparationMixin, LazyConstraintCallback):
+    """
+    Reject the integer solutions that violate a constraint
+    """
+
+    def __init__(self, env):
+        LazyConstraintCallback.__init__(self, env)
+        ConstraintCallbackMixin.__init__(self)
+
+    def __call__(self):
+        self.add_violated_constraints()
+
+
+class UserSeparationCallback(SeparationMixin, UserCutCallback):
+    """
+    Tighten the fractional solutions of the branch and bound nodes
+    """
+
+    def __init__(self, env):
+        UserCutCallback.__init__(self, env)
+        ConstraintCallbackMixin.__init__(self)
+
+    def __call__(self):
+        self.add_violated_constraints()
@@ -0,0 +1,235 @@
+"""
+Copyright (c) 2021 Mauro Marini
+
+Permission is hereby granted, free of charge, to any person
+obtaining a copy of this software and associated documentation
+files (the "Software"), to deal in the Software without
+restriction, including without limitation the rights to use,
+copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following
+conditions:
+
+The above copyright notice and this permission notice shall be
+included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import numpy as np
+
+# Residual capacities below this value are considered saturated
+EPSILON = 1e-9
+
+
+class FlowNetwork:
+    """
+    Dense flow network solved with Dinic's algorithm
+    """
+
+    def __init__(self, capacity):
+        """
+        Constructor
+        :param capacity: a square numpy array, capacity[i][j] is the capacity of the arc (i, j)
+        """
+        self.capacity = np.array(capacity, dtype=float)
+        self.nodes = len(self.capacity)
+        # The flow is kept skew symmetric: flow[i][j] == -flow[j][i]
+        self.flow = np.zeros_like(self.capacity)
+
+    def reset(self):
+        """
+        Remove all the flow from the network
+        :return:
+        """
+        self.flow[:] = 0
+
+    def residual(self):
+        """
+        Get the residual capacities
+        :return: a square numpy array with the residual capacity of each arc
+        """
+        return self.capacity - self.flow
+
+    def flow_value(self, s):
+        """
+        Get the value of the current flow
+        :param s: the source node
+        :return: the net flow leaving s
+        """
+        return self.flow[s].sum()
+
+    def update_capacity(self, tails, heads, values):
+        """
+        Change the capacity of some arcs and keep the flow: the flow in excess on the arcs whose capacity went below
+        their flow is cancelled, the next max flow repairs the conservation of the nodes before augmenting
+        :param tails: a numpy array with the tail of each changed arc
+        :param heads: a numpy array with the head of each changed arc
+        :param values: a numpy array with the new capacity of each arc
+        :return:
+        """
+        self.capacity[tails, heads] = values
+        over = np.maximum(self.flow[tails, heads] - self.capacity[tails, heads], 0)
+        self.flow[tails, heads] -= over
+        self.flow[heads, tails] += over
+
+    def max_flow(self, s, t):
+        """
+        Compute the maximum flow from s to t, starting from the current flow (the flow of a previous max flow, to other
+        terminals or with other capacities, is repaired first)
+        :param s: the source node
+        :param t: the sink node
+        :return: the value of the maximum flow
+        """
+        self.__restore_conservation(s, t)
+        residual = self.residual()
+        while True:
+            level = self.__build_levels(residual, s, t)
+            if level[t] < 0:
+                break
+            self.__blocking_flow(residual, level, s, t)
+        return self.flow_value(s)
+
+    def min_cut(self, s):
+        """
+        Get the source side of the minimum cut, i.e. the nodes reachable from s in the residual network
+        :param s: the source node
+        :return: a boolean numpy array, True for the nodes on the source side
+        """
+        level = self.__build_levels(self.residual(), s)
+        return level >= 0
+
+    def __restore_conservation(self, s, t):
+        """
+        Turn the current flow into a flow from s to t: the excess of every other node is sent through the residual
+        network to s, t or a node with a deficit, and the deficits are covered the same way (the flow is removed if a
+        node can't be balanced)
+        :param s: the source node
+        :param t: the sink node
+        :return:
+        """
+        # Inflow minus outflow of each node
+        excess = -self.flow.sum(axis=1)
+        excess[[s, t]] = 0
+        residual = self.residual()
+        while True:
+            unbalanced = np.flatnonzero(np.abs(excess) > EPSILON)
+            if len(unbalanced) == 0:
+                return
+            u = unbalanced[0]
+            # An excess is sent forward, a deficit is covered by a path found backward
+            forward = excess[u] > 0
+            targets = excess < -EPSILON if forward else excess > EPSILON
+            targets[[s, t]] = True
+            path = self.__find_path(residual if forward else residual.T, u, targets)
+            if path is None:
+                self.reset()
+                return
+            if not forward:
+                path = path[::-1]
+            end = path[-1] if forward else path[0]
+            amount = min(abs(excess[u]), residual[path[:-1], path[1:]].min())
+            if end != s and end != t:
+                amount = min(amount, abs(excess[end]))
+            self.__augment(residual, path, amount)
+            excess[path[0]] -= amount
+            excess[path[-1]] += amount
+            excess[[s, t]] = 0
+
+    def __find_path(self, residual, source, targets):
+        """
+        Breadth first search of a path of the residual network from a node to any of the targets
+        :param residual: the residual capacities
+        :param source: the first node of the path
+        :param targets: a boolean numpy array, True for the nodes where the path can end
+        :return: a numpy array with the nodes of the path, None if no target is reachable
+        """
+        parent = np.full(self.nodes, -1)
+        parent[source] = source
+        frontier = np.array([source])
+        while len(frontier) > 0:
+            arcs = (residual[frontier] > EPSILON) & (parent < 0)
+            reached = arcs.any(axis=0)
+            parent[reached] = frontier[arcs.argmax(axis=0)[reached]]
+            found = np.flatnonzero(reached & targets)
+            if len(found) > 0:
+                path = [found[0]]
+                while path[-1] != source:
+                    path.append(parent[path[-1]])
+                return np.array(path[::-1])
+            frontier = np.flatnonzero(reached)
+        return None
+
+    def __build_levels(self, residual, s, t=None):
+        """
+        Breadth first visit of the residual network
+        :param residual: the residual capacities
+        :param s: the source node
+        :param t: the sink node, the visit stops at its level (None to visit the whole network)
+        :return: a numpy array with the distance of each node from s (-1 if unreachable)
+        """
+        level = np.full(self.nodes, -1)
+        level[s] = 0
+        frontier = np.array([s])
+        depth = 0
+        while len(frontier) > 0 and (t is None or level[t] < 0):
+            depth += 1
+            reached = (residual[frontier] > EPSILON).any(axis=0) & (level < 0)
+            frontier = np.flatnonzero(reached)
+            level[frontier] = depth
+        return level
+
+    def __blocking_flow(self, residual, level, s, t):
+        """
+        Saturate every shortest augmenting path of the level graph
+        :param residual: the residual capacities (updated in place)
+        :param level: the distance of each node from s
+        :param s: the source node
+        :param t: the sink node
+        :return:
+        """
+        admissible = (residual > EPSILON) & (level[None, :] == level[:, None] + 1)
+        neighbours = [np.flatnonzero(row) for row in admissible]
+        pointer = [0] * self.nodes
+        path = [s]
+        while True:
+            u = path[-1]
+            if u == t:
+                self.__augment(residual, np.array(path))
+                path = [s]
+                continue
+            # Advance along the first admissible arc which is not saturated
+            while pointer[u] < len(neighbours[u]) and residual[u, neighbours[u][pointer[u]]] <= EPSILON:
+                pointer[u] += 1
+            if pointer[u] < len(neighbours[u]):
+                path.append(neighbours[u][pointer[u]])
+            elif u == s:
+                return
+            else:
+                # Dead end: retreat and discard the arc used to get here
+                path.pop()
+                pointer[path[-1]] += 1
+
+    def __augment(self, residual, path, delta=None):
+        """
+        Push the bottleneck capacity along a path
+        :param residual: the residual capacities (updated in place)
+        :param path: a numpy array with the nodes of the path from s to t
+        :param delta: the flow to push (None for the bottleneck capacity)
+        :return:
+        """
+        tails = path[:-1]
+        heads = path[1:]
+        if delta is None:
+            delta = residual[tails, heads].min()
+        self.flow[tails, heads] += delta
+        self.flow[heads, tails] -= delta
+        residual[tails, heads] -= delta
+        residual[heads, tails] += delta
@@ -0,0 +1,70 @@
+"""
+Copyright (c) 2021 Mauro Marini
+
+Permission is hereby granted, free of charge, to any person
+obtaining a copy of this software and associated documentation
+files (the "Software"), to deal in the Software without
+restriction, including without limitation the rights to use,
+copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following
+conditions:
+
+The above copyright notice and this permission notice shall be
+included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+
+import numpy as np
+
+from heuristic import tour_cost
+
+
+def solve_held_karp(costs):
+    """
+    Solve a small instance exactly with the Held-Karp dynamic programming: cost[S][j] is the cost of the cheapest path
+    from node 0 through the nodes of S ending in j. The subsets of the same size are processed at once
+    (O(2^n * n^2) time and O(2^n * n) memory)
+    :param costs: the cost matrix (or a tsplib.CoordinateCosts)
+    :return: a numpy array with the nodes of the optimal tour (starting from node 0) and its cost
+    """
+    matrix = np.asarray(costs, dtype=float)
+    nodes = len(matrix)
+    if nodes <= 2:
+        tour = np.arange(nodes)
+        return tour, tour_cost(tour, costs)
+    # Node j + 1 is bit j of the subsets, node 0 is the start
+    others = nodes - 1
+    inner = matrix[1:, 1:]
+    subsets = np.arange(1 << others)
+    members = (subsets[:, None] >> np.arange(others)) & 1
+    cost = np.full((1 << others, others), np.inf)
+    parent = np.zeros((1 << others, others), dtype=int)
+    cost[1 << np.arange(others), np.arange(others)] = matrix[0, 1:]
+    sizes = members.sum(axis=1)
+    for size in range(2, others + 1):
+        layer = subsets[sizes == size]
+        for j in range(others):
+            last = layer[members[layer, j] == 1]
+            # Paths through the subset without j, then to j
+            candidates = cost[last ^ (1 << j)] + inner[:, j]
+            parent[last, j] = np.argmin(candidates, axis=1)
+            cost[last, j] = candidates[np.arange(len(last)), parent[last, j]]
+    # Close the tour and walk the parents back
+    subset = (1 << others) - 1
+    j = np.argmin(cost[subset] + matrix[1:, 0])
+    tour = []
+    while subset:
+        tour.append(j + 1)
+        subset, j = subset ^ (1 << j), parent[subset, j]
+    tour = np.array([0] + tour[::-1])
+    return tour, tour_cost(tour, costs)
@@ -0,0 +1,268 @@
+"""
+Copyright (c) 2021 Mauro Marini
+
+Permission is hereby granted, free of charge, to any person
+obtaining a copy of this software and associated documentation
+files (the "Software"), to deal in the Software without
+restriction, including without limitation the rights to use,
+copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following
+conditions:
+
+The above copyright notice and this permission notice shall be
+included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import numpy as np
+
+from tsplib import CoordinateCosts
+
+# Number of nearest neighbours considered by the local search moves
+NEIGHBOURS = 10
+# Maximum length of the segments moved by Or-opt
+OR_OPT_SEGMENT = 3
+# Minimum gain of an improving move
+EPSILON = 1e-9
+# Rows of the cost matrix processed at once by the neighbour lists
+BLOCK_ROWS = 256
+
+
+def tour_cost(tour, costs):
+    """
+    Get the cost of a tour
+    :param tour: a numpy array with the nodes in visiting order (the tour goes back to the first node)
+    :param costs: the cost matrix (numpy array)
+    :return: the cost of the tour
+    """
+    return costs[tour, np.roll(tour, -1)].sum()
+
+
+def is_symmetric(costs):
+    """
+    Check if the costs are symmetric: the moves that reverse a part of the tour are only evaluated correctly in this
+    case
+    :param costs: the cost matrix (or a tsplib.CoordinateCosts, always symmetric)
+    :return: True if costs[i, j] == costs[j, i] for each pair of nodes
+    """
+    if isinstance(costs, CoordinateCosts):
+        return True
+    costs = np.asarray(costs)
+    return np.array_equal(costs, costs.T)
+
+
+def rotate_tour(tour, start=0):
+    """
+    Rotate a tour to start from a node
+    :param tour: a numpy array with the nodes in visiting order
+    :param start: the first node of the rotated tour
+    :return: a numpy array with the same tour, starting from start
+    """
+    return np.roll(tour, -np.flatnonzero(tour == start)[0])
+
+
+def nearest_neighbour_tour(costs, start=0):
+    """
+    Build a tour always moving to the nearest node not visited yet
+    :param costs: the cost matrix (numpy array)
+    :param start: the first node of the tour
+    :return: a numpy array with the nodes in visiting order
+    """
+    nodes = len(costs)
+    tour = np.zeros(nodes, dtype=int)
+    tour[0] = start
+    visited = np.zeros(nodes, dtype=bool)
+    visited[start] = True
+    for k in range(1, nodes):
+        tour[k] = np.argmin(np.where(visited, np.inf, costs[tour[k - 1]]))
+        visited[tour[k]] = True
+    return tour
+
+
+def get_neighbour_lists(costs, k=NEIGHBOURS):
+    """
+    Get the k nearest neighbours of each node
+    :param costs: the cost matrix (numpy array)
+    :param k: the number of neighbours
+    :return: a numpy array, row i contains the k nearest neighbours of i sorted by cost
+    """
+    nodes = len(costs)
+    k = min(k, nodes - 1)
+    neighbours = np.empty((nodes, k), dtype=int)
+    # By blocks of rows, the full matrix is never needed at once
+    for start in range(0, nodes, BLOCK_ROWS):
+        rows = np.arange(start, min(start + BLOCK_ROWS, nodes))
+        candidates = np.array(costs[start:rows[-1] + 1], dtype=float)
+        candidates[np.arange(len(rows)), rows] = np.inf
+        nearest = np.argpartition(candidates, k - 1, axis=1)[:, :k]
+        order = np.argsort(np.take_along_axis(candidates, nearest, axis=1), axis=1)
+        neighbours[rows] = np.take_along_axis(nearest, order, axis=1)
+    return neighbours
+
+
+def two_opt(tour, costs, neighbours):
+    """
+    Improve the tour with 2-opt moves: replace the edges (a, succ(a)), (c, succ(c)) with (a, c), (succ(a), succ(c)),
+    with c one of the nearest neighbours of a. The gains of all the moves are evaluated at once, the best one is applied
+    (the gains are exact for symmetric costs only, the search stops if the tour doesn't get cheaper)
+    :param tour: a numpy array with the nodes in visiting order
+    :param costs: the cost matrix (numpy array)
+    :param neighbours: the neighbour lists
+    :return: the improved tour
+    """
+    tour = tour.copy()
+    cost = tour_cost(tour, costs)
+    nodes = len(tour)
+    position = np.empty(nodes, dtype=int)
+    while True:
+        position[tour] = np.arange(nodes)
+        a = tour[:, None]
+        b = np.roll(tour, -1)[:, None]
+        c = neighbours[tour]
+        j = position[c]
+        d = tour[(j + 1) % nodes]
+        gains = costs[a, b] + costs[c, d] - costs[a, c] - costs[b, d]
+        i, k = np.unravel_index(np.argmax(gains), gains.shape)
+        if gains[i, k] <= EPSILON:
+            return tour
+        # Reverse the path from succ(a) to c
+        start, end = sorted([i, j[i, k]])
+        moved = tour.copy()
+        moved[start + 1:end + 1] = tour[start + 1:end + 1][::-1]
+        moved_cost = tour_cost(moved, costs)
+        if moved_cost >= cost - EPSILON:
+            return tour
+        tour, cost = moved, moved_cost
+
+
+def or_opt(tour, costs, neighbours, max_segment=OR_OPT_SEGMENT, reverse=True):
+    """
+    Improve the tour with Or-opt moves: move a segment of up to max_segment nodes between a neighbour c of its first
+    node and the successor of c, in either orientation. The gains of all the moves are evaluated at once, the best one
+    is applied (the search stops if the tour doesn't get cheaper)
+    :param tour: a numpy array with the nodes in visiting order
+    :param costs: the cost matrix (numpy array)
+    :param neighbours: the neighbour lists
+    :param max_segment: the maximum length of the moved segments
+    :param reverse: try the reversed orientation of the segments too (symmetric costs only)
+    :return: the improved tour
+    """
+    tour = tour.copy()
+    cost = tour_cost(tour, costs)
+    nodes = len(tour)
+    position = np.empty(nodes, dtype=int)
+    i = np.arange(nodes)
+    while True:
+        position[tour] = i
+        best_gain, best_move = EPSILON, None
+        for length in range(1, min(max_segment, nodes - 3) + 1):
+            # The segment tour[i:i + length] is moved, p and n are the nodes around it
+            first, last = tour, tour[(i + length - 1) % nodes]
+            p, n = np.roll(tour, 1), tour[(i + length) % nodes]
+            removal = costs[p, first] + costs[last, n] - costs[p, n]
+            # c must be outside of the segment and different from p
+            c = neighbours[first]
+            valid = ((position[c] - i[:, None]) % nodes >= length) & (c != p[:, None])
+            d = tour[(position[c] + 1) % nodes]
+            first, last, removal = first[:, None], last[:, None], removal[:, None]
+            forward = removal - (costs[c, first] + costs[last, d] - costs[c, d])
+            backward = removal - (costs[c, last] + costs[first, d] - costs[c, d])
+            gains = np.where(valid, np.maximum(forward, backward) if reverse else forward, -np.inf)
+            start, k = np.unravel_index(np.argmax(gains), gains.shape)
+            if gains[start, k] > best_gain:
+                best_gain = gains[start, k]
+                best_move = start, length, c[start, k], reverse and backward[start, k] > forward[start, k]
+        if best_move is None:
+            return tour
+        start, length, c, reversed_segment = best_move
+        rolled = np.roll(tour, -start)
+        segment = rolled[:length][::-1] if reversed_segment else rolled[:length]
+        rest = rolled[length:]
+        k = np.flatnonzero(rest == c)[0] + 1
+        moved = np.concatenate([rest[:k], segment, rest[k:]])
+        moved_cost = tour_cost(moved, costs)
+        if moved_cost >= cost - EPSILON:
+            return tour
+        tour, cost = moved, moved_cost
+
+
+def local_search(tour, costs, neighbours, symmetric=None):
+    """
+    Improve a tour with 2-opt and Or-opt until no move improves it, for asymmetric costs only with the Or-opt moves
+    that keep the orientation of the segments
+    :param tour: a numpy array with the nodes in visiting order
+    :param costs: the cost matrix (numpy array)
+    :param neighbours: the neighbour lists
+    :param symmetric: True if the costs are symmetric (None to check it)
+    :return: a numpy array with the nodes of the improved tour (starting from node 0) and its cost
+    """
+    if symmetric is None:
+        symmetric = is_symmetric(costs)
+    cost = tour_cost(tour, costs)
+    if len(tour) > 3:
+        while True:
+            if symmetric:
+                tour = two_opt(tour, costs, neighbours)
+            tour = or_opt(tour, costs, neighbours, reverse=symmetric)
+            improved_cost = tour_cost(tour, costs)
+            if improved_cost >= cost - EPSILON:
+                break
+            cost = improved_cost
+    return rotate_tour(tour), cost
+
+
+def solve_heuristic(costs):
+    """
+    Build a tour with nearest neighbour and improve it with 2-opt and Or-opt until no move improves it
+    :param costs: the cost matrix (or a tsplib.CoordinateCosts, which is not materialised)
+    :return: a numpy array with the nodes of the tour (starting from node 0) and its cost
+    """
+    if not isinstance(costs, CoordinateCosts):
+        costs = np.asarray(costs, dtype=float)
+    tour = nearest_neighbour_tour(costs)
+    if len(tour) <= 3:
+        return tour, tour_cost(tour, costs)
+    return local_search(tour, costs, get_neighbour_lists(costs))
+
+
+def patch_subtours(cycles, costs, neighbours):
+    """
+    Merge the subtours of a solution into a single tour (Karp patching): the smallest subtour is joined to one of the
+    others, removing an edge from each of them and adding the two cheapest edges that reconnect them, until a single
+    tour is left (the other subtour is only reversed when the costs are symmetric). The tour is improved with 2-opt
+    and Or-opt
+    :param cycles: a list of numpy arrays, the nodes of each subtour in visiting order
+    :param costs: the cost matrix (or a tsplib.CoordinateCosts)
+    :param neighbours: the neighbour lists
+    :return: a numpy array with the nodes of the tour (starting from node 0) and its cost
+    """
+    symmetric = is_symmetric(costs)
+    cycles = sorted(cycles, key=len)
+    while len(cycles) > 1:
+        small = cycles.pop(0)
+        # Edge (a, b) of the small subtour against each edge (c, d) of the other ones
+        a, b = small[:, None], np.roll(small, -1)[:, None]
+        c = np.concatenate(cycles)
+        d = np.concatenate([np.roll(cycle, -1) for cycle in cycles])
+        removed = costs[a, b] + costs[c, d]
+        # Keep the orientation of the other subtour (a, d), (c, b) or reverse it (a, c), (d, b)
+        keep = costs[a, d] + costs[c, b] - removed
+        reverse = costs[a, c] + costs[d, b] - removed if symmetric else np.full(keep.shape, np.inf)
+        i, k = np.unravel_index(np.argmin(np.minimum(keep, reverse)), keep.shape)
+        owner = np.searchsorted(np.cumsum([len(cycle) for cycle in cycles]), k, side='right')
+        other = cycles.pop(owner)
+        # The small subtour from b to a, then the other one from d to c (or from c back to d)
+        path = np.roll(small, -(i + 1))
+        other = np.roll(other, -np.flatnonzero(other == d[k])[0])
+        merged = np.concatenate([path, other[::-1] if reverse[i, k] < keep[i, k] else other])
+        cycles.insert(np.searchsorted([len(cycle) for cycle in cycles], len(merged)), merged)
+    return local_search(cycles[0], costs, neighbours, symmetric)
@@ -24,38 +24,128 @@ OTHER DEALINGS IN THE SOFTWARE.
 """
 
 
+import glob
+import hashlib
+import os
+
 import numpy as np
 
-from conf import loading_params, VERBOSE
+import tsplib
+import conf
+
+# Extension of the cache files saved next to the instances
+CACHE_EXTENSION = '.npy'
 
 
 def load_costs_matrix(filename):
     """
-    Load the costs matrix given the filename
+    Load the costs matrix given the filename (a .dat file with the "C = [...]" matrix or a TSPLIB .tsp file),
+    the parsed data is cached in a binary file next to the instance (if its directory is writable) and memory mapped
+    by the following runs
     :param filename: a string containing the name of the file
-    :return: the coast matrix
+    :return: the cost matrix (numpy array, int32 if all the costs are integers, float32 otherwise) or,
+    for the TSPLIB coordinate instances, a tsplib.CoordinateCosts computing the costs on demand
+    """
+    with open(filename, 'rb') as f:
+        data = f.read()
+    if filename.endswith('.tsp'):
+        header = tsplib.read_header(data.decode())
+        costs = tsplib.create_costs(header, load_cached(filename, data, lambda text: tsplib.read_section(text, header)))
+    else:
+        costs = load_cached(filename, data, parse_costs_matrix)
+    if conf.VERBOSE:
+        print('loaded ' + filename + ': ' + str(len(costs)) + ' nodes (' + str(costs.dtype) + ')')
+    if isinstance(costs, tsplib.CoordinateCosts):
+        # Already symmetric
+        return costs
+    return transform_to_symmetric(costs) if conf.loading_params['symmetric_costs'] else costs
+
+
+def load_cached(filename, data, parse):
+    """
+    Parse the instance, or memory map its cache file if it exists
+    :param filename: the name of the instance file
+    :param data: the content of the instance file (bytes)
+    :param parse: the function parsing the content (string) into a numpy array
+    :return: the parsed numpy array
     """
-    costs = []
-    read = False
-    f = open(filename, "r")
-    for line in f:
-        # Skip last line
-        if "];" in line:
-            read = False
-        # Read row, replace wrong character and convert into float list
-        if read:
-            row = line.replace('[', '')
-            row = row.replace('],', '')
-            row = row.replace(']', '')
-            row = row.split(',')
-            row = [float(x) for x in row]
-            costs.append(row)
-        # Start reading values
-        if "C = [" in line:
-            read = True
-    if VERBOSE:
-        print(costs)
-    return transform_to_symmetric(costs) if loading_params['symmetric_costs'] else costs
+    if not conf.loading_params['cache']:
+        return parse(data.decode())
+    cache_file = get_cache_filename(filename, data)
+    if not os.path.exists(cache_file):
+        parsed = parse(data.decode())
+        try:
+            save_cache(filename, cache_file, parsed)
+        except OSError:
+            # The directory of the instance is not writable: the parsed array is used without a cache
+            return parsed
+    return np.load(cache_file, mmap_mode='r')
+
+
+def load_optimal_cost(filename):
+    """
+    Get the optimal cost written in the instance file ("optimal_cost = ...;" in the .dat files, "OPTIMAL_COST : ..." in
+    the specification part of the .tsp files)
+    :param filename: the name of the file
+    :return: the optimal cost (None if the file doesn't have it)
+    """
+    with open(filename, 'r') as f:
+        for line in f:
+            key, separator, value = line.partition('=' if '=' in line else ':')
+            if separator and key.strip().lower() == 'optimal_cost':
+                return float(value.strip().rstrip(';'))
+    return None
+
+
+def parse_costs_matrix(text):
+    """
+    Parse the costs matrix written between "C = [" and "];"
+    :param text: the content of the instance file
+    :return: the cost matrix
+    """
+    start = text.index('C = [') + len('C = [')
+    end = text.index('];', start)
+    # Brackets and commas are only separators
+    block = text[start:end].replace('[', ' ').replace(']', ' ').replace(',', ' ')
+    values = np.array(block.split(), dtype=np.float64)
+    nodes = int(round(np.sqrt(len(values))))
+    if nodes * nodes != len(values):
+        raise ValueError('the costs matrix is not square: ' + str(len(values)) + ' values')
+    costs = values.reshape(nodes, nodes)
+    # Compact type: integer costs are exact in int32
+    return tsplib.compact(costs)
+
+
+def get_cache_filename(filename, data):
+    """
+    Get the name of the cache file, keyed by the hash of the instance content
+    :param filename: the name of the instance file
+    :param data: the content of the instance file (bytes)
+    :return: the name of the cache file
+    """
+    return filename + '.' + hashlib.sha1(data).hexdigest()[:16] + CACHE_EXTENSION
+
+
+def save_cache(filename, cache_file, costs):
+    """
+    Save the parsed matrix and remove the cache files of older versions of the instance
+    :param filename: the name of the instance file
+    :param cache_file: the name of the cache file
+    :param costs: the cost matrix
+    :return:
+    """
+    for stale in glob.glob(glob.escape(filename) + '.*' + CACHE_EXTENSION):
+        if stale != cache_file:
+            os.remove(stale)
+    # Write to a temporary file first, so that concurrent readers never see a partial matrix
+    temporary = cache_file + '.' + str(os.getpid()) + '.tmp'
+    try:
+        with open(temporary, 'wb') as f:
+            np.save(f, costs)
+        os.replace(temporary, cache_file)
+    finally:
+        if os.path.exists(temporary):
+            os.remove(temporary)
 
 
 def transform_to_symmetric(costs):
@@ -64,9 +154,9 @@ def transform_to_symmetric(costs):
     :param costs: the cost matrix
     :return: the symmetric cost matrix
     """
-    costs = np.matrix(costs).astype(int)
-    if loading_params['maintain_maximum_cost']:
-        costs = np.maximum(costs, costs.transpose())
-    else:
-        np.minimum(costs, costs.transpose())
-    return costs.tolist()
+    # A symmetric matrix is returned as is, keeping the memory mapped pages shared
+    if np.array_equal(costs, costs.T):
+        return costs
+    if conf.loading_params['maintain_maximum_cost']:
+        return np.maximum(costs, costs.T)
+    return np.minimum(costs, costs.T)
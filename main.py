@@ -23,74 +23,85 @@ FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
 OTHER DEALINGS IN THE SOFTWARE.
 """
 
-import time
 
-import docplex
+import argparse
+import json
+import sys
+import time
 
-from maximum_flow import MaximumFlowSolver
-from assignment import *
-from load_dataset import *
-from subpath_finder import get_paths
-from utils import *
+import conf
+from held_karp import solve_held_karp
+from load_dataset import load_costs_matrix
+from utils import print_formatted_path
 
 
-# Costs Matrix
-costs = []
+def solve_instance(instance, time_limit=None, gap=0):
+    """
+    Solve an instance: by Held-Karp dynamic programming if it is small, by the cutting planes otherwise (the solver
+    modules are only imported in this case)
+    :param instance: the instance file
+    :param time_limit: the wall clock budget in seconds (None for no limit)
+    :param gap: the relative optimality gap at which the search stops
+    :return: the best tour (None if no tour is found), its cost, the gap and the solve time in seconds
+    """
+    costs = load_costs_matrix(instance)
+    if len(costs) <= conf.solver_params['held_karp_nodes']:
+        start = time.time()
+        tour, cost = solve_held_karp(costs)
+        return tour, cost, 0.0, time.time() - start
+    from cut_pool import create_cut_pool, save_cut_pool
+    from solver import solve_tsp
+    pool = create_cut_pool(instance, len(costs))
+    incumbent = solve_tsp(costs, time_limit, gap, pool)
+    save_cut_pool(pool, instance)
+    return incumbent.tour, incumbent.cost, incumbent.gap, incumbent.timings['total']
 
-if __name__ == '__main__':
-    costs = load_costs_matrix("dataset/att48.dat")
-    # Number of nodes
-    nodes = len(costs)
-    # Range of the nodes
-    range_nodes = range(nodes)
-    MaximumFlowSolver.t_nodes = list(range_nodes)[1:]
-    start = time.time()
-    len_paths = 999
-    paths = None
-    second_step_constraints = []
 
-    # Create the model
-    m, x = create_assignment_model('tsp_continuous_relaxing', range_nodes, costs)
+def print_result(instance, tour, cost, gap, elapsed, output_format='text'):
+    """
+    Print the result of a solve
+    :param instance: the instance file
+    :param tour: a numpy array with the nodes of the tour (None if no tour is found)
+    :param cost: the cost of the tour
+    :param gap: the relative optimality gap
+    :param elapsed: the solve time in seconds
+    :param output_format: 'text' for the cost and the formatted path, 'json' for a single JSON object
+    :return:
+    """
+    if output_format == 'json':
+        found = tour is not None
+        print(json.dumps({
+            'instance': instance,
+            'cost': cost.item() if found else None,
+            'gap': float(gap) if found else None,
+            'elapsed_time': elapsed,
+            'tour': tour.tolist() if found else None
+        }))
+    elif tour is not None:
+        print('cost: ' + str(cost) + '\tgap: ' + str(gap) + '\telapsed time: ' + str(elapsed))
+        print_formatted_path(tour.tolist() + [0])
+    else:
+        print('no tour found\telapsed time: ' + str(elapsed))
 
-    while True:
-        # Solve the model
-        solution = m.solve()
-        if conf.VERBOSE:
-            m.report()
-            print(solution.solve_status)
-        # Get the solution as df
-        df = solution.as_df()
-        # Get al the paths
-        paths = get_paths(df, nodes)
-        len_paths = len(paths)
-        if conf.VERBOSE:
-            print('#paths: ' + str(len(paths)))
-            print(paths)
-        # 1. Get capacities from continuous relaxing solution
-        max_flow = MaximumFlowSolver(df, range_nodes, 0)
-        # 2. Solve max flow using capacities
-        max_flow.solve_max_flow()
-        # 3. Get constraint from max flow
-        s, t = max_flow.export_constraint_easy(paths)
-        if s is not None and t is not None:
-            second_step_constraints.append([s, t])
-            # add second step constraints
-            add_cut_constraint(m, x, paths, [[s, t]], range_nodes)
-        # check len paths
-        if len_paths == 1:
-            break
 
-    if paths is not None:
-        # Get the final path
-        path = convert_path_to_final(paths[0][0])
-        # Convert the path to the decision variable matrix
-        matrix = convert_path_to_matrix(path, nodes)
-        # Convert the cost list of list to a numpy matrix
-        costs_matrix = numpy.array(costs)
-        # Multiply and sum the result
-        result = matrix * costs_matrix
-        end = time.time()
-        elapsed = end - start
-        if conf.VERBOSE:
-            print('cost: ' + str(result.sum()) + '\telapsed time: ' + str(elapsed))
-            print_formatted_path(paths)
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Solve a TSP instance to optimality')
+    parser.add_argument('instance', nargs='?', default='dataset/att48.dat', help='instance file (.dat or TSPLIB .tsp)')
+    parser.add_argument('-m', '--mode', choices=['callback', 'resolve'], default=conf.solver_params['mode'],
+                        help='lazy constraints in a single solve (docplex only) or a solve after each round of cuts')
+    parser.add_argument('-b', '--backend', choices=['highs', 'docplex'], default=conf.solver_params['backend'],
+                        help='MIP solver')
+    parser.add_argument('-t', '--time-limit', type=float, default=conf.solver_params['time_limit'],
+                        help='time budget in seconds')
+    parser.add_argument('-g', '--gap', type=float, default=conf.solver_params['gap'],
+                        help='relative optimality gap at which the search stops')
+    parser.add_argument('-f', '--format', choices=['text', 'json'], default='text',
+                        help='output format: cost and path, or a single JSON object (without the solver log)')
+    parser.add_argument('-q', '--quiet', action='store_true', help='print only the result')
+    args = parser.parse_args()
+    conf.solver_params['mode'] = args.mode
+    conf.solver_params['backend'] = args.backend
+    conf.VERBOSE = conf.VERBOSE and not args.quiet and args.format == 'text'
+    result = solve_instance(args.instance, args.time_limit, args.gap)
+    print_result(args.instance, *result, output_format=args.format)
+    sys.exit(0 if result[0] is not None else 1)
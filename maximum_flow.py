@@ -23,132 +23,101 @@ FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
 OTHER DEALINGS IN THE SOFTWARE.
 """
 
-from docloud.status import JobSolveStatus
-from docplex.mp.model import Model
+import numpy as np
 
 import conf
-from utils import find_path_by_node
+from flow_network import FlowNetwork
+from utils import solution_to_capacity
+
+# Tolerance used to decide if a cut is violated
+EPSILON = 1e-6
 
 
 class MaximumFlowSolver:
     """
-    Maximum Flow solver
+    Maximum Flow solver: the flow network lives between the iterations, each new solution only changes the capacity
+    of the arcs whose value changed and the previous flow is repaired instead of being computed again
     """
 
-    t_nodes = []
-
-    def __init__(self, solution_df, range_nodes, s=0):
+    def __init__(self, nodes, s=0, symmetrize=np.maximum):
         """
         Constructor
-        :param solution_df: the solution of the continuous relaxation (pd dataframe)
-        :param range_nodes: an iterator from 0 to #nodes-1
+        :param nodes: the number of nodes
         :param s: the starting node
+        :param symmetrize: the numpy function used to combine x[i, j] and x[j, i] into the capacity (numpy.add gives
+        the exact capacity of the cuts)
         """
-        assert len(MaximumFlowSolver.t_nodes) > 0
         self.__s = s
-        self.__t = MaximumFlowSolver.t_nodes.pop(0)
-        self.__crate_max_flow_model(range_nodes)
-        self.__set_transhipment_for_all_nodes(range_nodes)
-        self.__set_capacity_constraints(range_nodes, solution_df)
-        self.__create_objective_function()
-
-    def __set_capacity_constraints(self, range_nodes, solution_df):
-        """
-        Set capacity for each edge
-        :param range_nodes:  an iterator from 0 to #nodes-1
-        :param solution_df:  the solution of the continuous relaxation (pd dataframe)
-        :return:
-        """
-        for i in range_nodes:
-            for j in range_nodes:
-                value = max(self.__get_capacity_constraint(i, j, solution_df),
-                            self.__get_capacity_constraint(j, i, solution_df))
-                if conf.VERBOSE:
-                    print('start: ' + str(i) + ', end: ' + str(j) + ', value: ' + str(value))
-                self.__model.add_constraint(self.__x[i, j] <= value)
-                self.__model.add_constraint(self.__x[j, i] <= value)
+        self.__symmetrize = symmetrize
+        # The sinks are used in turn, from one solve to the next
+        self.__sinks = [t for t in range(nodes) if t != s]
+        self.__t = None
+        self.__value = None
+        self.__network = FlowNetwork(np.zeros((nodes, nodes)))
 
-    @staticmethod
-    def __get_capacity_constraint(start, end, solution_df):
+    @property
+    def sinks(self):
         """
-        Get capacities from the continuous relaxation solution and set it as constraints of the current model
-        :param start: the start node
-        :param end: the end node
-        :param solution_df: the solution of the continuous relaxation (pd dataframe)
-        :return: the value for capacity
+        Get the number of sinks
+        :return: the number of nodes other than the starting one
         """
-        value = solution_df.loc[(solution_df['start'] == start) & (solution_df['end'] == end)]['value'].tolist()
-        value.append(0)
-        return value[0]
+        return len(self.__sinks)
 
-    def __set_transhipment_for_all_nodes(self, range_nodes):
+    def update(self, solution):
         """
-        Set b(v) = 0 for all v in V
-        :param range_nodes: an iterator from 0 to #nodes-1
-        :return:
+        Set the capacity of each edge from a new solution: by default max(x[i, j], x[j, i]). Only the arcs whose
+        capacity changed are updated
+        :param solution: the solution of the continuous relaxation in matrix form
+        :return: the number of arcs whose capacity changed
         """
-        [self.__model.add_constraint(self.__model.sum([
-            - (self.__model.sum(self.__x[j, i] if i != j else 0 for j in range_nodes)),
-            self.__model.sum(self.__x[i, j] if i != j else 0 for j in range_nodes)
-        ]) == 0) for i in range_nodes]
-        [self.__model.add_constraint(self.__x[i, i] == 0) for i in range_nodes]
+        capacity = solution_to_capacity(solution, self.__symmetrize)
+        np.fill_diagonal(capacity, 0)
+        tails, heads = np.nonzero(np.abs(capacity - self.__network.capacity) > EPSILON)
+        self.__network.update_capacity(tails, heads, capacity[tails, heads])
+        self.__value = None
+        return len(tails)
 
-    def __crate_max_flow_model(self, range_nodes):
+    def solve_max_flow(self):
         """
-        Create max flow model
-        :param range_nodes: an iterator from 0 to #nodes-1
-        :return:
+        Solve max flow to the next sink, starting from the flow of the previous solve
+        :return: the value of the maximum flow
         """
-        self.__model = Model(name='max_flow_from_' + str(self.__s) + '_to_' + str(self.__t), log_output=conf.VERBOSE)
-        self.__x = self.__model.continuous_var_matrix(range_nodes, range_nodes)
+        self.__t = self.__sinks.pop(0)
+        self.__sinks.append(self.__t)
         if conf.VERBOSE:
-            print(self.__model.name + '\ts: ' + str(self.__s) + '\tt: ' + str(self.__t))
+            print('max_flow_from_' + str(self.__s) + '_to_' + str(self.__t))
+        self.__value = self.__network.max_flow(self.__s, self.__t)
+        return self.__value
 
-    def __create_objective_function(self):
+    def get_min_cut(self):
         """
-        create objective function
-        :return:
+        Get the minimum cut found by the max flow
+        :return: two lists of nodes, the source side and the sink side of the cut
         """
-        self.__model.maximize(1 * self.__x[self.__t, self.__s])
-
-    def solve_max_flow(self):
-        """
-        Solve max flow
-        :return: the solution of the max flow problem
-        """
-        solution = self.__model.solve()
-        if conf.VERBOSE:
-            self.__model.report()
-        MaximumFlowSolver.t_nodes.append(self.__t)
-        return solution
+        source_side = self.__network.min_cut(self.__s)
+        return np.flatnonzero(source_side).tolist(), np.flatnonzero(~source_side).tolist()
 
     def export_constraint(self):
         """
         Export constraint generated by max flow
         :return: a tuple s, t
         """
+        if self.__value is None:
+            raise Exception("MAX_FLOW_NOT_SOLVED")
         if conf.VERBOSE:
-            print(self.__model.solve_status)
-        if self.__model.solve_status == JobSolveStatus.INFEASIBLE_OR_UNBOUNDED_SOLUTION:
-            raise Exception("INFEASIBLE_OR_UNBOUNDED_SOLUTION")
-        else:
-            if self.__model.solution.objective_value < 1:
-                return self.__s, self.__t
-            else:
-                print('s: ' + str(self.__s) + ', t: ' + str(self.__t) + ', solution: ' + str(
-                    self.__model.solution.objective_value))
-        if self.__model.solution.objective_value >= 1:
-            print('s: ' + str(self.__s) + ', t: ' + str(self.__t) + ', solution: ' + str(
-                self.__model.solution.objective_value < 1))
+            print('s: ' + str(self.__s) + ', t: ' + str(self.__t) + ', solution: ' + str(self.__value))
+        if self.__value < 1:
+            return self.__s, self.__t
         return None, None
 
-    def export_constraint_easy(self, paths):
+    def export_cut_set(self, threshold=2):
         """
-        Export constraint easy
-        :return: a tuple s, t
+        Export the minimum cut if it is violated
+        :param threshold: the minimum capacity of a valid cut
+        :return: the list of the nodes on the sink side of the cut, None if the cut is not violated
         """
-        p1 = find_path_by_node(paths, self.__s)
-        p2 = find_path_by_node(paths, self.__t)
-        if p1 != p2:
-            return self.__s, self.__t
-        return None, None
+        if self.__value is None:
+            raise Exception("MAX_FLOW_NOT_SOLVED")
+        if self.__value < threshold - EPSILON:
+            return self.get_min_cut()[1]
+        return None
@@ -0,0 +1,171 @@
+"""
+Copyright (c) 2021 Mauro Marini
+
+Permission is hereby granted, free of charge, to any person
+obtaining a copy of this software and associated documentation
+files (the "Software"), to deal in the Software without
+restriction, including without limitation the rights to use,
+copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following
+conditions:
+
+The above copyright notice and this permission notice shall be
+included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+
+import numpy as np
+
+import conf
+import profiler
+from assignment import add_cut_set_constraints, add_edges, tag_matrix, use_symmetric_model
+from separation import separate_cut_sets
+from utils import solution_to_capacity, solution_to_matrix
+
+# Rows of the reduced cost matrix computed at once
+BLOCK_ROWS = 256
+# Tolerance on the reduced costs
+EPSILON = 1e-6
+
+
+def reduced_costs(costs, duals, matrix, weights, start, end, reverse=False):
+    """
+    Compute the reduced cost c[i, j] - sum(y[r] * a[r, (i, j)]) of the arcs leaving the nodes start..end-1, the
+    coefficients a[r, (i, j)] are given by the tags of the constraints
+    :param costs: the cost matrix
+    :param duals: a numpy array with the dual value of each constraint
+    :param matrix: the node sets of the tagged constraints (see assignment.tag_matrix)
+    :param weights: the out, in and inside weights of the tagged constraints
+    :param start: the first node of the block
+    :param end: the node after the last one of the block
+    :param reverse: compute the reduced costs of the arcs entering the nodes of the block instead
+    :return: a (end - start, #nodes) numpy array with the reduced costs
+    """
+    # Each constraint contributes y * out_weight if only i is in S, y * in_weight if only j is in S and
+    # y * inside_weight if both are in S
+    tail_duals = matrix.T @ (duals * weights[:, 0])
+    head_duals = matrix.T @ (duals * weights[:, 1])
+    both_duals = duals * (weights[:, 2] - weights[:, 0] - weights[:, 1])
+    # The single node sets (the degree constraints) never contain both the nodes of an arc
+    multiple = (np.diff(matrix.indptr) > 1) & (both_duals != 0)
+    if reverse:
+        tail_duals, head_duals = head_duals, tail_duals
+        block = np.array(costs[:, start:end], dtype=float).T
+    else:
+        block = np.array(costs[start:end], dtype=float)
+    block -= tail_duals[start:end, np.newaxis] + head_duals[np.newaxis, :]
+    if multiple.any():
+        sets = matrix[multiple]
+        block -= (sets[:, start:end].T @ (sets.multiply(both_duals[multiple, np.newaxis]))).toarray()
+    return block
+
+
+def find_priced_edges(m, x, costs, duals, threshold, limit=None):
+    """
+    Find the edges without a variable whose reduced cost is below a threshold
+    :param m: the model
+    :param x: the variable index matrix
+    :param costs: the cost matrix
+    :param duals: a numpy array with the dual value of each constraint
+    :param threshold: the reduced cost threshold
+    :param limit: the maximum number of edges, the ones with the lowest reduced cost (None for no limit)
+    :return: the (tails, heads) numpy arrays of the edges, tails < heads
+    """
+    nodes = len(x)
+    matrix, weights = tag_matrix(m.row_tags, nodes)
+    tails, heads, values = [], [], []
+    for start in range(0, nodes, BLOCK_ROWS):
+        end = min(start + BLOCK_ROWS, nodes)
+        block = reduced_costs(costs, duals, matrix, weights, start, end)
+        if not use_symmetric_model():
+            # The edge is needed if one of its two arcs is priced out
+            block = np.minimum(block, reduced_costs(costs, duals, matrix, weights, start, end, reverse=True))
+        rows, columns = np.nonzero((block < threshold) & (x[start:end] < 0))
+        # One edge (i, j) with i < j for each pair of nodes
+        keep = columns > rows + start
+        tails.append(rows[keep] + start)
+        heads.append(columns[keep])
+        values.append(block[rows[keep], columns[keep]])
+    tails, heads, values = np.concatenate(tails), np.concatenate(heads), np.concatenate(values)
+    if limit is not None and len(values) > limit:
+        best = np.argpartition(values, limit - 1)[:limit]
+        tails, heads = tails[best], heads[best]
+    return tails, heads
+
+
+def price_edges(m, x, costs, range_nodes, incumbent, pool=None):
+    """
+    Complete the sparse model: solve its linear relaxation with the subtour cuts, add the missing edges with a
+    negative reduced cost until there is none, then add the edges that could be in a tour cheaper than the incumbent
+    (the reduced cost of the others is greater than the gap between the tour and the bound of the relaxation)
+    :param m: the model
+    :param x: the variable index matrix
+    :param costs: the cost matrix
+    :param range_nodes: an iterator from 0 to #nodes-1
+    :param incumbent: the incumbent, its lower bound is raised to the bound of the relaxation
+    :param pool: the cut pool that records the cuts (None for no pool)
+    :return: the incumbent
+    """
+    while True:
+        if incumbent.remaining_time() == 0:
+            # The edges are not all priced: the relaxation is not a bound and the model stays a heuristic
+            return incumbent
+        relaxation = m.solve_relaxation(incumbent.remaining_time())
+        if relaxation is None:
+            return incumbent
+        values, bound, duals, _ = relaxation
+        cut_sets = separate_cut_sets(solution_to_capacity(solution_to_matrix(values, x)),
+                                     time_limit=incumbent.remaining_time())
+        if pool is not None:
+            cut_sets = pool.add(cut_sets)
+        if cut_sets:
+            add_cut_set_constraints(m, x, cut_sets, range_nodes)
+            incumbent.cuts += len(cut_sets)
+            profiler.current.count('cuts', len(cut_sets))
+            continue
+        tails, heads = find_priced_edges(m, x, costs, duals, -EPSILON, len(range_nodes))
+        if conf.VERBOSE:
+            print('relaxation: ' + str(bound) + '\t#priced edges: ' + str(len(tails)))
+        if len(tails) == 0:
+            break
+        add_edges(m, x, costs, tails, heads)
+        profiler.current.count('priced_edges', len(tails))
+    incumbent.update_lower_bound(bound)
+    tails, heads = find_priced_edges(m, x, costs, duals, incumbent.cost - bound + EPSILON)
+    add_edges(m, x, costs, tails, heads)
+    if conf.VERBOSE:
+        print('#edges added within the gap: ' + str(len(tails)) + '\t#variables: ' + str(x.max() + 1))
+    return incumbent
+
+
+def fix_variables(m, incumbent):
+    """
+    Fix to zero the variables whose reduced cost is greater than the gap between the incumbent and the linear
+    relaxation: a tour that uses one of them costs more than the incumbent
+    :param m: the model
+    :param incumbent: the incumbent, its lower bound is raised to the bound of the relaxation
+    :return: a numpy array with the columns fixed to zero (none if the time budget is over)
+    """
+    if incumbent.tour is None or incumbent.remaining_time() == 0:
+        return np.zeros(0, dtype=int)
+    relaxation = m.solve_relaxation(incumbent.remaining_time())
+    if relaxation is None:
+        return np.zeros(0, dtype=int)
+    _, bound, _, reduced = relaxation
+    incumbent.update_lower_bound(bound)
+    columns = np.nonzero(reduced > incumbent.cost - bound + EPSILON)[0]
+    m.fix_to_zero(columns)
+    profiler.current.set('fixed_variables', len(columns))
+    if conf.VERBOSE:
+        print('relaxation: ' + str(bound) + '\t#variables fixed to zero: ' + str(len(columns)))
+    return columns
@@ -0,0 +1,184 @@
+"""
+Copyright (c) 2021 Mauro Marini
+
+Permission is hereby granted, free of charge, to any person
+obtaining a copy of this software and associated documentation
+files (the "Software"), to deal in the Software without
+restriction, including without limitation the rights to use,
+copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following
+conditions:
+
+The above copyright notice and this permission notice shall be
+included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+
+import csv
+import json
+import time
+from contextlib import nullcontext
+
+# Context manager of the disabled profiler, shared by all the stages
+NO_STAGE = nullcontext()
+
+
+class Stage:
+    """
+    Context manager that adds its wall clock time to a stage of the current iteration
+    """
+
+    def __init__(self, record, name):
+        """
+        Constructor
+        :param record: the dict of the iteration
+        :param name: the name of the stage
+        """
+        self.record = record
+        self.name = name
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.record[self.name] = self.record.get(self.name, 0.0) + time.perf_counter() - self.start
+        return False
+
+
+class Profiler:
+    """
+    Time of each stage and counters of each iteration of the cutting plane loop (iteration 0 is the preprocessing:
+    heuristic, model build, pricing and fixing)
+    """
+
+    def __init__(self, enabled=False):
+        """
+        Constructor
+        :param enabled: record the stages and the counters (a disabled profiler does nothing)
+        """
+        self.enabled = enabled
+        self.records = [{'iteration': 0}] if enabled else []
+        # Names of the values given by set, their total is the last value instead of the sum
+        self.levels = set()
+
+    def start_iteration(self):
+        """
+        Start recording a new iteration
+        :return:
+        """
+        if self.enabled:
+            self.records.append({'iteration': len(self.records)})
+
+    def stage(self, name):
+        """
+        Time a stage of the current iteration: with profiler.stage('name'): ...
+        :param name: the name of the stage
+        :return: the context manager
+        """
+        if not self.enabled:
+            return NO_STAGE
+        return Stage(self.records[-1], name + '_time')
+
+    def count(self, name, value=1):
+        """
+        Add to a counter of the current iteration
+        :param name: the name of the counter
+        :param value: the amount to add
+        :return:
+        """
+        if self.enabled:
+            record = self.records[-1]
+            record[name] = record.get(name, 0) + value
+
+    def set(self, name, value):
+        """
+        Set a value of the current iteration (e.g. the size of the model)
+        :param name: the name of the value
+        :param value: the value
+        :return:
+        """
+        if self.enabled:
+            self.records[-1][name] = value
+            self.levels.add(name)
+
+    def totals(self):
+        """
+        Get the sum of each stage time and counter over all the iterations (the last value for the values given by set)
+        :return: a dict
+        """
+        totals = {}
+        for record in self.records:
+            for name, value in record.items():
+                if name in self.levels:
+                    totals[name] = value
+                elif name != 'iteration':
+                    totals[name] = totals.get(name, 0) + value
+        return totals
+
+    def fields(self):
+        """
+        Get the names of all the recorded values
+        :return: a list of names, in order of first appearance
+        """
+        fields = {}
+        for record in self.records:
+            fields.update(dict.fromkeys(record))
+        return list(fields)
+
+    def export_json(self, filename):
+        """
+        Save the records as JSON
+        :param filename: the name of the file
+        :return:
+        """
+        with open(filename, 'w') as f:
+            json.dump({'iterations': self.records, 'totals': self.totals()}, f, indent=1)
+
+    def export_csv(self, filename):
+        """
+        Save the records as CSV, a row for each iteration
+        :param filename: the name of the file
+        :return:
+        """
+        with open(filename, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=self.fields())
+            writer.writeheader()
+            writer.writerows(self.records)
+
+    def export(self, filename):
+        """
+        Save the records, as CSV if the file name ends with .csv and as JSON otherwise
+        :param filename: the name of the file
+        :return:
+        """
+        if filename.endswith('.csv'):
+            self.export_csv(filename)
+        else:
+            self.export_json(filename)
+
+
+# Profiler of the running solve, replaced by start_profiler
+current = Profiler()
+
+
+def start_profiler(enabled):
+    """
+    Replace the current profiler with a new one
+    :param enabled: record the stages and the counters
+    :return: the new profiler
+    """
+    global current
+    current = Profiler(enabled)
+    return current
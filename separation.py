@@ -0,0 +1,230 @@
+"""
+Copyright (c) 2021 Mauro Marini
+
+Permission is hereby granted, free of charge, to any person
+obtaining a copy of this software and associated documentation
+files (the "Software"), to deal in the Software without
+restriction, including without limitation the rights to use,
+copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following
+conditions:
+
+The above copyright notice and this permission notice shall be
+included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import parent_process, shared_memory
+
+import numpy as np
+
+import conf
+from flow_network import FlowNetwork
+
+# A subtour elimination constraint requires at least 2 units of flow across every cut
+CUT_THRESHOLD = 2
+# Tolerance used to decide if a cut is violated
+EPSILON = 1e-6
+# Sink chunks of each worker of the parallel separation, more chunks balance the load better
+CHUNKS_PER_WORKER = 4
+
+# Process pool of the parallel separation (and its size), created at the first use and kept for the following rounds
+# of the solve (shut down by shutdown_pool)
+pool = None
+pool_workers = None
+
+
+def gomory_hu_tree(capacity, time_limit=None, cuts=None):
+    """
+    Build the Gomory-Hu cut tree of an undirected graph (Gusfield's algorithm, n-1 max flow computations)
+    :param capacity: a symmetric numpy array with the capacity of each edge
+    :param time_limit: the time budget in seconds, the tree is left incomplete when it is over (None for no limit)
+    :param cuts: a list where the value and the source side of the cut of each max flow are appended (None to not
+    keep them)
+    :return: two numpy arrays parent, weight: the tree edge (i, parent[i]) has weight weight[i], node 0 is the root
+    (None, None if the time budget is over before the tree is complete)
+    """
+    start = time.time()
+    nodes = len(capacity)
+    parent = np.zeros(nodes, dtype=int)
+    weight = np.zeros(nodes)
+    for s in range(1, nodes):
+        if time_limit is not None and time.time() - start >= time_limit:
+            return None, None
+        t = parent[s]
+        network = FlowNetwork(capacity)
+        value = network.max_flow(s, t)
+        source_side = network.min_cut(s)
+        if cuts is not None:
+            cuts.append((value, source_side))
+        weight[s] = value
+        # Move the nodes on the s side of the cut under s
+        moved = source_side & (parent == t)
+        moved[s] = False
+        parent[moved] = s
+        if source_side[parent[t]]:
+            parent[s] = parent[t]
+            parent[t] = s
+            weight[s] = weight[t]
+            weight[t] = value
+    return parent, weight
+
+
+def get_subtree(parent, node):
+    """
+    Get the nodes of the subtree rooted in node
+    :param parent: the parent of each node in the cut tree
+    :param node: the root of the subtree
+    :return: a boolean numpy array, True for the nodes of the subtree
+    """
+    subtree = np.zeros(len(parent), dtype=bool)
+    subtree[node] = True
+    # Propagate the membership from the parents until nothing changes (depth of the tree iterations)
+    while True:
+        grown = subtree | subtree[parent]
+        grown[0] = subtree[0]
+        if np.array_equal(grown, subtree):
+            return subtree
+        subtree = grown
+
+
+def find_violated_cuts(capacity, threshold=CUT_THRESHOLD, time_limit=None):
+    """
+    Find every cut of the cut tree with a capacity lower than the threshold
+    :param capacity: a symmetric numpy array with the capacity of each edge
+    :param threshold: the minimum capacity of a valid cut
+    :param time_limit: the time budget in seconds, only the cuts of the max flows computed within it are found when
+    it is over (None for no limit)
+    :return: a list of node lists, one for each violated cut (the side that doesn't contain node 0)
+    """
+    cuts = None if time_limit is None else []
+    parent, weight = gomory_hu_tree(capacity, time_limit, cuts)
+    if parent is None:
+        # Incomplete tree: the violated cuts among the ones of the max flows computed so far
+        sides = {}
+        for value, source_side in cuts:
+            if value < threshold - EPSILON:
+                side = ~source_side if source_side[0] else source_side
+                sides.setdefault(np.packbits(side).tobytes(), side)
+        return [np.flatnonzero(side).tolist() for side in sides.values()]
+    violated = np.flatnonzero(weight < threshold - EPSILON)
+    return [np.flatnonzero(get_subtree(parent, node)).tolist() for node in violated if node != 0]
+
+
+def global_min_cut(capacity):
+    """
+    Get the global minimum cut of the graph
+    :param capacity: a symmetric numpy array with the capacity of each edge
+    :return: the capacity of the cut and the list of the nodes on the side that doesn't contain node 0
+    """
+    parent, weight = gomory_hu_tree(capacity)
+    node = 1 + np.argmin(weight[1:])
+    return float(weight[node]), np.flatnonzero(get_subtree(parent, node)).tolist()
+
+
+def separate_cut_sets(capacity, threshold=CUT_THRESHOLD, time_limit=None):
+    """
+    Find violated cuts with the method selected in the configuration ('gomory_hu' or 'parallel')
+    :param capacity: a symmetric numpy array with the capacity of each edge
+    :param threshold: the minimum capacity of a valid cut
+    :param time_limit: the time budget of the cut tree in seconds, some violated cuts can be missed when it is over
+    (None for no limit, required to cut every integer solution with subtours)
+    :return: a list of node lists, one for each violated cut (the side that doesn't contain node 0)
+    """
+    if conf.separation_params['method'] == 'parallel':
+        return find_violated_cuts_parallel(capacity, 0, threshold, conf.separation_params['workers'])
+    return find_violated_cuts(capacity, threshold, time_limit)
+
+
+def find_violated_cuts_parallel(capacity, s=0, threshold=CUT_THRESHOLD, workers=None):
+    """
+    Solve the max flow from s to every other node with a pool of processes that share the capacity array, and
+    collect the distinct violated minimum cuts
+    :param capacity: a symmetric numpy array with the capacity of each edge
+    :param s: the source node
+    :param threshold: the minimum capacity of a valid cut
+    :param workers: the number of processes (None for all the cores, 1 to run in this process)
+    :return: a list of node lists, one for each distinct violated cut (the side that doesn't contain s)
+    """
+    global pool, pool_workers
+    capacity = np.asarray(capacity, dtype=float)
+    sinks = np.delete(np.arange(len(capacity)), s)
+    workers = workers or os.cpu_count()
+    # Inside a worker of another pool (batch runs) the sinks are separated in this process, no nested pool
+    if workers == 1 or len(sinks) < 2 or parent_process() is not None:
+        masks = separate_sinks(capacity, s, sinks, threshold)
+    else:
+        memory = shared_memory.SharedMemory(create=True, size=max(capacity.nbytes, 1))
+        try:
+            np.ndarray(capacity.shape, dtype=capacity.dtype, buffer=memory.buf)[:] = capacity
+            if pool is None or pool_workers != workers:
+                pool, pool_workers = ProcessPoolExecutor(workers), workers
+            chunks = np.array_split(sinks, min(len(sinks), workers * CHUNKS_PER_WORKER))
+            futures = [pool.submit(separate_shared_sinks, memory.name, capacity.shape, s, chunk, threshold)
+                       for chunk in chunks]
+            masks = [mask for future in futures for mask in future.result()]
+        finally:
+            memory.close()
+            memory.unlink()
+    # The same cut separates many sinks from s: keep each node set once
+    cut_sets = {}
+    for mask in masks:
+        cut_sets.setdefault(np.packbits(mask).tobytes(), mask)
+    return [np.flatnonzero(mask).tolist() for mask in cut_sets.values()]
+
+
+def shutdown_pool():
+    """
+    Shut down the process pool of the parallel separation, if it was created
+    :return:
+    """
+    global pool, pool_workers
+    if pool is not None:
+        pool.shutdown()
+        pool, pool_workers = None, None
+
+
+def separate_shared_sinks(name, shape, s, sinks, threshold):
+    """
+    Run separate_sinks on a capacity array in shared memory (executed by the workers of the pool)
+    :param name: the name of the shared memory block
+    :param shape: the shape of the capacity array
+    :param s: the source node
+    :param sinks: a numpy array with the sink nodes
+    :param threshold: the minimum capacity of a valid cut
+    :return: a list of boolean numpy arrays, the sink side of each violated cut
+    """
+    memory = shared_memory.SharedMemory(name=name)
+    masks = separate_sinks(np.ndarray(shape, dtype=float, buffer=memory.buf), s, sinks, threshold)
+    memory.close()
+    return masks
+
+
+def separate_sinks(capacity, s, sinks, threshold):
+    """
+    Solve the max flow from s to each sink and keep the minimum cuts with a capacity lower than the threshold
+    :param capacity: a symmetric numpy array with the capacity of each edge
+    :param s: the source node
+    :param sinks: a numpy array with the sink nodes
+    :param threshold: the minimum capacity of a valid cut
+    :return: a list of boolean numpy arrays, the sink side of each violated cut
+    """
+    masks = []
+    network = FlowNetwork(capacity)
+    for t in sinks:
+        network.reset()
+        if network.max_flow(s, t) < threshold - EPSILON:
+            masks.append(~network.min_cut(s))
+    return masks
@@ -0,0 +1,132 @@
+"""
+Copyright (c) 2021 Mauro Marini
+
+Permission is hereby granted, free of charge, to any person
+obtaining a copy of this software and associated documentation
+files (the "Software"), to deal in the Software without
+restriction, including without limitation the rights to use,
+copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following
+conditions:
+
+The above copyright notice and this permission notice shall be
+included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+
+import time
+
+import conf
+import profiler
+from assignment import add_cut_set_constraints, create_model, get_candidate_edges
+from cutting_plane import Incumbent, solve_root_relaxation, solve_with_callback, solve_with_resolve
+from held_karp import solve_held_karp
+from heuristic import solve_heuristic
+from pricing import fix_variables, price_edges
+from separation import shutdown_pool
+
+
+def solve_tsp(costs, time_limit=None, gap=0, pool=None):
+    """
+    Solve an instance with the configured formulation, backend and mode (solve_model), the small instances by Held-Karp
+    dynamic programming
+    :param costs: the cost matrix
+    :param time_limit: the wall clock budget in seconds (None for no limit)
+    :param gap: the relative optimality gap at which the search stops
+    :param pool: a cut pool, its cuts are added to the model before the first solve (None for no pool)
+    :return: the incumbent, with the best tour, the bounds, the counters and the time of each stage (the records of
+    each iteration are in profiler.current)
+    """
+    # Number of nodes
+    nodes = len(costs)
+    # Range of the nodes
+    range_nodes = range(nodes)
+    # Best tour and lower bound, within the time budget
+    incumbent = Incumbent(costs, time_limit, gap)
+    profile = profiler.start_profiler(conf.profiling_params['enabled'])
+
+    if nodes <= conf.solver_params['held_karp_nodes']:
+        # Small instance: exact dynamic programming, no model
+        with profile.stage('held_karp'):
+            tour, tour_cost = solve_held_karp(costs)
+        incumbent.update_tour(tour)
+        incumbent.update_lower_bound(tour_cost)
+        incumbent.timings['total'] = incumbent.elapsed_time()
+        if conf.profiling_params['output'] is not None:
+            profile.export(conf.profiling_params['output'])
+        return incumbent
+
+    try:
+        solve_model(costs, range_nodes, incumbent, profile, pool)
+    finally:
+        # The workers of the parallel separation don't outlive the solve
+        shutdown_pool()
+    incumbent.timings['total'] = incumbent.elapsed_time()
+    if conf.profiling_params['output'] is not None:
+        profile.export(conf.profiling_params['output'])
+    return incumbent
+
+
+def solve_model(costs, range_nodes, incumbent, profile, pool=None):
+    """
+    Solve an instance with the model: heuristic tour, model (sparse and priced if required), linear relaxation with
+    cuts (in the two phase mode), reduced cost fixing and cutting planes
+    :param costs: the cost matrix
+    :param range_nodes: an iterator from 0 to #nodes-1
+    :param incumbent: the incumbent, updated with the best tour and the bounds
+    :param profile: the profiler of the solve
+    :param pool: a cut pool, its cuts are added to the model before the first solve (None for no pool)
+    :return: the incumbent
+    """
+    # Heuristic tour, the upper bound is given to the solver as MIP start
+    start = time.time()
+    with profile.stage('heuristic'):
+        tour, tour_cost = solve_heuristic(costs)
+    incumbent.update_tour(tour)
+    incumbent.timings['heuristic'] = time.time() - start
+    if conf.VERBOSE:
+        print('heuristic cost: ' + str(tour_cost))
+
+    # Create the model, on the candidate edges (and the heuristic tour) in the sparse mode
+    start = time.time()
+    candidates = None
+    if conf.solver_params['candidates'] is not None:
+        candidates = get_candidate_edges(costs, conf.solver_params['candidates'], tour)
+    with profile.stage('model_build'):
+        m, x = create_model('tsp_continuous_relaxing', range_nodes, costs, candidates)
+        if pool is not None:
+            # Cuts found by the previous solves of the instance
+            add_cut_set_constraints(m, x, pool.cut_sets(), range_nodes)
+    if candidates is not None:
+        with profile.stage('pricing'):
+            price_edges(m, x, costs, range_nodes, incumbent, pool)
+    profile.set('variables', m.num_variables)
+    profile.set('constraints', m.num_constraints)
+    incumbent.timings['model'] = time.time() - start
+
+    if conf.solver_params['two_phase']:
+        # Tight root bound from the linear relaxation before the binary solve
+        start = time.time()
+        solve_root_relaxation(m, x, range_nodes, incumbent, pool)
+        incumbent.timings['relaxation'] = time.time() - start
+    if conf.solver_params['reduced_cost_fixing']:
+        with profile.stage('fixing'):
+            fix_variables(m, incumbent)
+
+    start = time.time()
+    if conf.solver_params['mode'] == 'callback' and m.supports_callbacks:
+        solve_with_callback(m, x, range_nodes, incumbent, pool)
+    else:
+        solve_with_resolve(m, x, range_nodes, incumbent, pool)
+    incumbent.timings['solve'] = time.time() - start
+    return incumbent
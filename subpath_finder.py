@@ -19,69 +19,135 @@ WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
 FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
 OTHER DEALINGS IN THE SOFTWARE.
 """
-from utils import convert_dataframe_names
 
+import numpy as np
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
 
-def get_subsequent_node(visited):
+from heuristic import rotate_tour
+
+# Values above this threshold are part of the support graph, values above 1 - EPSILON are considered integer
+EPSILON = 1e-4
+
+
+def get_components(start, end, nodes):
     """
-    get the subsequent node
-    :param visited: a boolean list tracking the nodes which have been visited
-    :return: -1 if all nodes have been visited or the index of the first node that hasn't been visited
+    Get the connected components of the support graph
+    :param start: a numpy array with the starting node of each arc in the support
+    :param end: a numpy array with the ending node of each arc in the support
+    :param nodes: the number of the nodes
+    :return: the number of components and a numpy array with the component of each node
     """
-    for idx, val in enumerate(visited):
-        if not val:
-            return idx
-    return -1
+    support = coo_matrix((np.ones(len(start)), (start, end)), shape=(nodes, nodes))
+    return connected_components(support, directed=False)
 
 
-def __get_paths(df, nodes):
+def get_successors(start, end, nodes, symmetric):
     """
-    return all the sub paths
-    :param df: a Pandas dataframe that contains the solution of the model
+    Orient the solution as a successor array
+    :param start: a numpy array with the starting node of each arc of the (integer) solution
+    :param end: a numpy array with the ending node of each arc of the (integer) solution
     :param nodes: the number of the nodes
-    :return: a list of sub paths (list of list)
+    :param symmetric: True if the solution comes from the symmetric model
+    :return: a numpy array with the successor of each node
     """
-    visited = [False] * nodes
-    paths = []
-    path = []
-    node_counter = 0
-    # Set the node 1 to visited and add it to the path
-    visited[df['start'].iloc[0]] = True
-    path.append(df['start'].iloc[0])
-    node_counter += 1
-    # Take the endpoint of the arc
-    subsequent = df['end'].iloc[0]
-    while subsequent != -1:
-        # Set the start node to the visited and add it to the path
-        visited[df['start'].iloc[subsequent]] = True
-        path.append(df['start'].iloc[subsequent])
-        node_counter += 1
-        # If the end of the arc is not visited
-        if not visited[df['end'].iloc[subsequent]]:
-            # Change the subsequent node with the end of the arc
-            subsequent = df['end'].iloc[subsequent]
-        # If the end of the arc is visited
-        else:
-            # Add the end node to the path
-            path.append(df['end'].iloc[subsequent])
-            # Add the sub path to the paths list
-            paths.append((path, node_counter))
-            # Start a new path
-            path = []
-            node_counter = 0
-            # Get the subsequent node not visited
-            subsequent = get_subsequent_node(visited)
-    return paths
-
-
-def get_paths(df, nodes):
+    if not symmetric:
+        successors = np.zeros(nodes, dtype=int)
+        successors[start] = end
+        return successors
+    # Each node has two neighbours: orient each cycle starting from the edge to the first neighbour
+    neighbours = np.zeros((nodes, 2), dtype=int)
+    order = np.argsort(np.concatenate([start, end]), kind='stable')
+    neighbours.ravel()[:] = np.concatenate([end, start])[order]
+    successors = np.full(nodes, -1)
+    for first in range(nodes):
+        previous, node = first, neighbours[first][0]
+        while successors[previous] == -1:
+            successors[previous] = node
+            previous, node = node, neighbours[node][1] if neighbours[node][0] == previous else neighbours[node][0]
+    return successors
+
+
+class Paths:
+    """
+    Paths of a solution stored in int32 arrays: the nodes of all the paths one after the other, the offset where each
+    path starts and the path of each node
+    """
+
+    def __init__(self, nodes, offsets, labels, closed):
+        """
+        Constructor
+        :param nodes: a numpy array with the nodes of each path, in visiting order if the paths are closed
+        :param offsets: a numpy array with the position of the first node of each path (and the number of nodes last)
+        :param labels: a numpy array with the index of the path of each node
+        :param closed: True if each path is a cycle (integer solution), False if it is only the set of the nodes of a
+        component of the support graph
+        """
+        self.nodes = np.asarray(nodes, dtype=np.int32)
+        self.offsets = np.asarray(offsets, dtype=np.int32)
+        self.labels = np.asarray(labels, dtype=np.int32)
+        self.closed = closed
+
+    def __len__(self):
+        """
+        Get the number of paths
+        :return: the number of paths
+        """
+        return len(self.offsets) - 1
+
+    def __iter__(self):
+        """
+        Iterate over the paths
+        :return: an iterator over the node arrays of the paths
+        """
+        return (self[i] for i in range(len(self)))
+
+    def __getitem__(self, i):
+        """
+        Get a path
+        :param i: the index of the path
+        :return: a numpy array with the nodes of the path (a view, the first node is not repeated at the end)
+        """
+        return self.nodes[self.offsets[i]:self.offsets[i + 1]]
+
+    def path_of(self, node):
+        """
+        Get the path of a node, without scanning the other paths
+        :param node: the given node
+        :return: a numpy array with the nodes of the path
+        """
+        return self[self.labels[node]]
+
+    def tour(self, start=0):
+        """
+        Get the tour of a solution with a single closed path
+        :param start: the first node of the tour
+        :return: a numpy array with the nodes in visiting order, starting from start
+        """
+        assert self.closed and len(self) == 1
+        return rotate_tour(self.nodes, start)
+
+
+def get_paths(solution, symmetric=False):
     """
     Get paths
-    :param df: the current solution as df
-    :param nodes: the number of the nodes
-    :return: a list containing paths
+    :param solution: the current solution in matrix form
+    :param symmetric: True if the solution comes from the symmetric model
+    :return: the paths of the solution (for a fractional solution, the nodes of each component of the support graph)
     """
-    # Convert the dataframe
-    df = convert_dataframe_names(df, nodes)
-    # Get al the paths
-    return __get_paths(df, nodes)
+    nodes = len(solution)
+    start, end = np.nonzero(solution > EPSILON)
+    count, labels = get_components(start, end, nodes)
+    sizes = np.bincount(labels, minlength=count)
+    offsets = np.concatenate([[0], np.cumsum(sizes)])
+    if not np.all(solution[start, end] > 1 - EPSILON):
+        return Paths(np.argsort(labels, kind='stable'), offsets, labels, False)
+    successors = get_successors(start, end, nodes, symmetric).tolist()
+    path_nodes = []
+    # Each path starts from the smallest node of its component
+    for first, size in zip(np.unique(labels, return_index=True)[1].tolist(), sizes.tolist()):
+        node = first
+        for _ in range(size):
+            path_nodes.append(node)
+            node = successors[node]
+    return Paths(path_nodes, offsets, labels, True)
@@ -0,0 +1,259 @@
+"""
+Copyright (c) 2021 Mauro Marini
+
+Permission is hereby granted, free of charge, to any person
+obtaining a copy of this software and associated documentation
+files (the "Software"), to deal in the Software without
+restriction, including without limitation the rights to use,
+copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following
+conditions:
+
+The above copyright notice and this permission notice shall be
+included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+
+import numpy as np
+
+# Rows of the cost matrix computed at once by the coordinate instances
+BLOCK_ROWS = 256
+# Earth radius and pi used by the GEO distance of TSPLIB
+EARTH_RADIUS = 6378.388
+PI = 3.141592
+# Sections of the file (the other keywords are "KEY : VALUE" specifications)
+SECTIONS = ('NODE_COORD_SECTION', 'EDGE_WEIGHT_SECTION', 'DISPLAY_DATA_SECTION', 'TOUR_SECTION', 'EOF')
+
+
+def read_header(text):
+    """
+    Read the specification part of a TSPLIB file
+    :param text: the content of the file
+    :return: a dict with the specifications (upper case keys)
+    """
+    header = {}
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if line.split()[0].rstrip(':') in SECTIONS:
+            break
+        key, _, value = line.partition(':')
+        header[key.strip().upper()] = value.strip()
+    if header.get('TYPE', 'TSP').split()[0] not in ('TSP', 'ATSP'):
+        raise ValueError('unsupported TSPLIB type: ' + header['TYPE'])
+    header['DIMENSION'] = int(header['DIMENSION'])
+    header.setdefault('EDGE_WEIGHT_TYPE', 'EXPLICIT')
+    return header
+
+
+def read_section(text, header):
+    """
+    Read the data needed to compute the costs: the coordinates or the explicit weights
+    :param text: the content of the file
+    :param header: the specifications of the file
+    :return: a numpy array, (nodes, 2) coordinates or the full cost matrix
+    """
+    if header['EDGE_WEIGHT_TYPE'] == 'EXPLICIT':
+        return to_full_matrix(get_section_values(text, 'EDGE_WEIGHT_SECTION'), header)
+    # Each row is "node x y"
+    values = get_section_values(text, 'NODE_COORD_SECTION').reshape(-1, 3)
+    if len(values) != header['DIMENSION']:
+        raise ValueError('expected ' + str(header['DIMENSION']) + ' coordinates, found ' + str(len(values)))
+    coordinates = np.empty((len(values), 2))
+    coordinates[values[:, 0].astype(int) - 1] = values[:, 1:]
+    return coordinates
+
+
+def get_section_values(text, section):
+    """
+    Get all the numbers of a section, up to the next section
+    :param text: the content of the file
+    :param section: the name of the section
+    :return: a numpy array with the numbers
+    """
+    start = text.index(section) + len(section)
+    tokens = []
+    for line in text[start:].splitlines():
+        words = line.split()
+        if words and words[0].rstrip(':') in SECTIONS:
+            break
+        tokens += words
+    return np.array(tokens, dtype=np.float64)
+
+
+def to_full_matrix(values, header):
+    """
+    Expand the explicit weights to the full matrix
+    :param values: the numbers of the EDGE_WEIGHT_SECTION
+    :param header: the specifications of the file
+    :return: the cost matrix
+    """
+    nodes = header['DIMENSION']
+    weight_format = header.get('EDGE_WEIGHT_FORMAT', 'FULL_MATRIX')
+    if weight_format == 'FULL_MATRIX':
+        return compact(values[:nodes * nodes].reshape(nodes, nodes))
+    # Column formats are the row formats of the other triangle
+    weight_format = {'UPPER_COL': 'LOWER_ROW', 'LOWER_COL': 'UPPER_ROW',
+                     'UPPER_DIAG_COL': 'LOWER_DIAG_ROW', 'LOWER_DIAG_COL': 'UPPER_DIAG_ROW'}.get(weight_format,
+                                                                                              weight_format)
+    diagonal = 0 if 'DIAG' in weight_format else 1
+    if weight_format.startswith('UPPER'):
+        rows, columns = np.triu_indices(nodes, diagonal)
+    elif weight_format.startswith('LOWER'):
+        rows, columns = np.tril_indices(nodes, -diagonal)
+    else:
+        raise ValueError('unsupported EDGE_WEIGHT_FORMAT: ' + weight_format)
+    if len(values) < len(rows):
+        raise ValueError('expected ' + str(len(rows)) + ' weights, found ' + str(len(values)))
+    costs = np.zeros((nodes, nodes))
+    costs[rows, columns] = values[:len(rows)]
+    costs[columns, rows] = values[:len(rows)]
+    np.fill_diagonal(costs, 0)
+    return compact(costs)
+
+
+def compact(costs):
+    """
+    Convert the matrix to int32 if all the costs are integers, float32 otherwise
+    :param costs: the cost matrix
+    :return: the compact cost matrix
+    """
+    if np.all(costs == np.round(costs)) and np.abs(costs).max(initial=0) < np.iinfo(np.int32).max:
+        return costs.astype(np.int32)
+    return costs.astype(np.float32)
+
+
+def write_instance(filename, coordinates, name=None, weight_type='EUC_2D'):
+    """
+    Write a coordinate instance in the TSPLIB format
+    :param filename: the name of the file
+    :param coordinates: a (nodes, 2) numpy array
+    :param name: the name of the instance (the file name if None)
+    :param weight_type: the TSPLIB EDGE_WEIGHT_TYPE
+    :return:
+    """
+    lines = ['NAME : ' + (name or filename), 'TYPE : TSP', 'DIMENSION : ' + str(len(coordinates)),
+             'EDGE_WEIGHT_TYPE : ' + weight_type, 'NODE_COORD_SECTION']
+    lines += [str(i + 1) + ' ' + repr(float(a)) + ' ' + repr(float(b)) for i, (a, b) in enumerate(coordinates)]
+    with open(filename, 'w') as f:
+        f.write('\n'.join(lines + ['EOF', '']))
+
+
+def create_costs(header, data):
+    """
+    Create the costs of the instance
+    :param header: the specifications of the file
+    :param data: the array returned by read_section
+    :return: the cost matrix or, for the coordinate instances, a CoordinateCosts
+    """
+    if header['EDGE_WEIGHT_TYPE'] == 'EXPLICIT':
+        return data
+    return CoordinateCosts(data, header['EDGE_WEIGHT_TYPE'])
+
+
+class CoordinateCosts:
+    """
+    Cost matrix of a coordinate instance, the distances are computed when they are read.
+    Indexing follows numpy: costs[i] and costs[a:b] are rows, costs[i_array, j_array] are element-wise costs
+    """
+
+    def __init__(self, coordinates, weight_type):
+        """
+        Constructor
+        :param coordinates: a (nodes, 2) numpy array
+        :param weight_type: the TSPLIB EDGE_WEIGHT_TYPE (EUC_2D, CEIL_2D, ATT, GEO, MAN_2D or MAX_2D)
+        """
+        if weight_type not in ('EUC_2D', 'CEIL_2D', 'ATT', 'GEO', 'MAN_2D', 'MAX_2D'):
+            raise ValueError('unsupported EDGE_WEIGHT_TYPE: ' + weight_type)
+        self.coordinates = np.asarray(coordinates, dtype=np.float64)
+        self.weight_type = weight_type
+        self.nodes = len(self.coordinates)
+        self.shape = (self.nodes, self.nodes)
+        self.dtype = np.dtype(np.int32)
+        if weight_type == 'GEO':
+            # Latitude and longitude in radians, from the DDD.MM format
+            degrees = np.trunc(self.coordinates)
+            self.coordinates = PI * (degrees + 5.0 * (self.coordinates - degrees) / 3.0) / 180.0
+
+    def __len__(self):
+        return self.nodes
+
+    @property
+    def T(self):
+        # All the supported distances are symmetric
+        return self
+
+    def __getitem__(self, key):
+        """
+        Compute the requested costs
+        :param key: a row, a slice of rows or a (rows, columns) tuple
+        :return: the costs (numpy array)
+        """
+        if not isinstance(key, tuple):
+            key = (key, slice(None))
+        i, j = (np.arange(self.nodes)[k] if isinstance(k, slice) else np.asarray(k) for k in key)
+        # Rows against all the columns when a slice is used for the columns
+        if isinstance(key[1], slice) and i.ndim > 0:
+            i = i[:, np.newaxis]
+        return self.distances(i, j)
+
+    def distances(self, i, j):
+        """
+        Compute the costs between the nodes i and j, element-wise (numpy broadcasting)
+        :param i: the first nodes
+        :param j: the second nodes
+        :return: the costs (numpy array)
+        """
+        a = self.coordinates[i]
+        b = self.coordinates[j]
+        dx = a[..., 0] - b[..., 0]
+        dy = a[..., 1] - b[..., 1]
+        if self.weight_type == 'EUC_2D':
+            costs = np.floor(np.sqrt(dx * dx + dy * dy) + 0.5)
+        elif self.weight_type == 'CEIL_2D':
+            costs = np.ceil(np.sqrt(dx * dx + dy * dy))
+        elif self.weight_type == 'ATT':
+            distance = np.sqrt((dx * dx + dy * dy) / 10.0)
+            costs = np.floor(distance + 0.5)
+            costs += costs < distance
+        elif self.weight_type == 'GEO':
+            q1 = np.cos(a[..., 1] - b[..., 1])
+            q2 = np.cos(dx)
+            q3 = np.cos(a[..., 0] + b[..., 0])
+            costs = np.trunc(EARTH_RADIUS * np.arccos(np.clip(0.5 * ((1.0 + q1) * q2 - (1.0 - q1) * q3), -1, 1)) + 1.0)
+            # The formula gives 1 on the diagonal
+            costs = np.where(i == j, 0.0, costs)
+        elif self.weight_type == 'MAN_2D':
+            costs = np.floor(np.abs(dx) + np.abs(dy) + 0.5)
+        else:
+            costs = np.maximum(np.floor(np.abs(dx) + 0.5), np.floor(np.abs(dy) + 0.5))
+        return costs.astype(self.dtype)
+
+    def blocks(self, rows=BLOCK_ROWS):
+        """
+        Iterate over the cost matrix by blocks of rows
+        :param rows: the number of rows of each block
+        :return: a generator of (first row, block) tuples
+        """
+        for start in range(0, self.nodes, rows):
+            yield start, self[start:start + rows]
+
+    def __array__(self, dtype=None, copy=None):
+        """
+        Materialise the full matrix (only for the dense consumers, e.g. the solver models)
+        """
+        costs = np.empty(self.shape, dtype=self.dtype)
+        for start, block in self.blocks():
+            costs[start:start + len(block)] = block
+        return costs if dtype is None else costs.astype(dtype)